@@ -1,80 +1,121 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from openai import OpenAI
 from dotenv import load_dotenv
 from werkzeug.security import generate_password_hash, check_password_hash
-from sentiment_model import predict_emotion_and_sentiment
+
+# Load .env before importing local modules, they read their settings on import
+load_dotenv()
+
+from log_config import configure_logging
+configure_logging()
+
+from sentiment_model import (
+    predict_emotion_with_scores,
+    predict_emotions_batch,
+    EMOTION_LABELS,
+    start_model_warmup,
+    get_model_status,
+    get_batcher_stats,
+    get_translation_stats,
+)
 import jwt
+import base64
 import datetime
+import hashlib
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import os
 
 import mysql.connector
-from mysql.connector import pooling
-
-# Create connection pool to handle multiple concurrent requests
-db_config = {
-    "host": "localhost",
-    "user": "root",
-    "password": "1234",
-    "database": "chatbot_db",
-    "port": 9900,
-    "pool_name": "mypool",
-    "pool_size": 10,
-    "pool_reset_session": True,
-    "autocommit": False
-}
 
-try:
-    connection_pool = pooling.MySQLConnectionPool(**db_config)
-except mysql.connector.Error as err:
-    print(f"Error creating connection pool: {err}")
-    connection_pool = None
-
-def get_db_connection():
-    """Get a connection from the pool"""
-    try:
-        if connection_pool:
-            return connection_pool.get_connection()
-        else:
-            # Fallback to direct connection if pool fails
-            return mysql.connector.connect(
-                host="localhost",
-                user="root",
-                password="1234",
-                database="chatbot_db",
-                port=9900
-            )
-    except mysql.connector.Error as err:
-        print(f"Error getting connection: {err}")
-        raise
-
-def ensure_db_connection():
-    """Legacy function for backward compatibility - now uses pool"""
-    global db, cursor
-    try:
-        # Ping the database to check if connection is alive
-        db.ping(reconnect=True, attempts=3, delay=1)
-    except (mysql.connector.Error, AttributeError):
-        # Reconnect if connection is lost
-        try:
-            db = get_db_connection()
-            cursor = db.cursor()
-        except mysql.connector.Error as err:
-            print(f"Database connection failed: {err}")
-            raise
-
-load_dotenv()
+import db as db_pool
+from cache import TTLCache
+from emotion_scores import ROLLUP_COLUMNS, summarize_rollup
+from db import get_db, pooled_connection
+from persistence import make_chat_turn, persist_chat_turns
+from prompts import build_chat_messages
+from llm_client import LLMClient
+import metrics
+import queries
+import profiler
+from metrics import DB_QUERY_SECONDS, REQUEST_SECONDS, ERRORS, render_stats
+from write_behind import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)
+db_pool.init_app(app)
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+llm = LLMClient(api_key=os.getenv("OPENAI_API_KEY"))
 JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key")  # Add to .env
+ANALYZE_BATCH_MAX_TEXTS = int(os.getenv("ANALYZE_BATCH_MAX_TEXTS", "500"))
+# How many days of check-in rollups /api/insight looks at
+INSIGHT_WINDOW_DAYS = int(os.getenv("INSIGHT_WINDOW_DAYS", "30"))
+
+# Keyset pagination for list endpoints (?limit=&cursor=)
+PAGE_DEFAULT_LIMIT = int(os.getenv("PAGE_DEFAULT_LIMIT", "50"))
+PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", "200"))
+
+# Chat history sent to the model: newest messages within the token budget,
+# read from at most CHAT_HISTORY_MAX_ROWS rows
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))
+CHAT_HISTORY_MAX_ROWS = int(os.getenv("CHAT_HISTORY_MAX_ROWS", "40"))
+
+# Runs the independent stages of /api/chat (profile, emotion, history) in parallel
+CHAT_STAGE_WORKERS = int(os.getenv("CHAT_STAGE_WORKERS", "16"))
+chat_stage_executor = ThreadPoolExecutor(max_workers=CHAT_STAGE_WORKERS, thread_name_prefix="chat-stage")
+
+# Independent LLM calls that can run side by side (e.g. insight + motivation)
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", "8"))
+llm_executor = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="llm")
+
+# Insight / motivation texts per user, reused while the pattern stays the same
+INSIGHT_CACHE_SIZE = int(os.getenv("INSIGHT_CACHE_SIZE", "1024"))
+INSIGHT_CACHE_TTL = float(os.getenv("INSIGHT_CACHE_TTL_SECONDS", "21600"))
+INSIGHT_BUCKET_PERCENT = float(os.getenv("INSIGHT_BUCKET_PERCENT", "10"))
+insight_cache = TTLCache(max_size=INSIGHT_CACHE_SIZE, ttl=INSIGHT_CACHE_TTL)
+
+# Verified JWTs (by sha256 of the token), so repeat requests skip the HS256 decode.
+# Entries never outlive the token's own exp.
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
+token_cache = TTLCache(max_size=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+
+# Prompt profile fields per user; dropped on PUT / DELETE /api/profile
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "4096"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "3600"))
+profile_cache = TTLCache(max_size=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
+
+# Optional write-behind for chat turns: /api/chat replies without waiting on MySQL
+CHAT_WRITE_BEHIND = os.getenv("CHAT_WRITE_BEHIND", "0") == "1"
+WRITE_BEHIND_MAX_SIZE = int(os.getenv("WRITE_BEHIND_MAX_SIZE", "1000"))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "100"))
+WRITE_BEHIND_FLUSH_SECONDS = float(os.getenv("WRITE_BEHIND_FLUSH_SECONDS", "0.2"))
+
+
+def write_chat_turns(turns):
+    with pooled_connection() as conn:
+        persist_chat_turns(conn, turns)
+
+
+turn_writer = None
+if CHAT_WRITE_BEHIND:
+    turn_writer = WriteBehindQueue(
+        write_chat_turns,
+        max_size=WRITE_BEHIND_MAX_SIZE,
+        batch_size=WRITE_BEHIND_BATCH_SIZE,
+        flush_interval=WRITE_BEHIND_FLUSH_SECONDS,
+        name="chat-turn-writer",
+    )
 
-# Initialize database connection from pool
-db = get_db_connection()
-cursor = db.cursor()
+# Users allowed to call the /admin endpoints (comma-separated user ids)
+ADMIN_USER_IDS = {int(x) for x in os.getenv("ADMIN_USER_IDS", "").replace(" ", "").split(",") if x}
+# Upper bound for one /admin/profile run
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
 
 # Emotion labels
 emotion_map = ["Anger","Disgust","Fear","Joy","Neutral","Sadness","Surprise"]
@@ -94,358 +135,511 @@ def verify_token():
     token = request.headers.get('Authorization')
     if not token:
         return None
+
+    key = hashlib.sha256(token.encode()).hexdigest()
+    cached = token_cache.get(key)
+    if cached is not None:
+        user_id, exp = cached
+        if exp is None or exp > time.time():
+            return user_id
+        token_cache.delete(key)
+        return None
+
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-        return payload['user_id']
+        user_id = payload['user_id']
     except:
         return None
 
+    exp = payload.get('exp')
+    ttl = TOKEN_CACHE_TTL if exp is None else min(TOKEN_CACHE_TTL, exp - time.time())
+    if ttl > 0:
+        token_cache.set(key, (user_id, exp), ttl=ttl)
+    return user_id
+
+def load_user_profile(user_id):
+    """Profile fields used to personalize the chat prompt (cached, else own pooled connection)."""
+    cached = profile_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    with DB_QUERY_SECONDS.time(group="chat_profile"):
+        with pooled_connection() as conn:
+            profile_cursor = conn.cursor()
+            profile_cursor.execute("SELECT name, gender, course, education_level, race FROM users WHERE id = %s", (user_id,))
+            user_row = profile_cursor.fetchone()
+            profile_cursor.close()
+
+    user_profile = {
+        "name": user_row[0] if user_row else "Student",
+        "gender": user_row[1] if user_row and user_row[1] else "unknown",
+        "course": user_row[2] if user_row and user_row[2] else "unknown",
+        "education_level": user_row[3] if user_row and user_row[3] else "university",
+        "race": user_row[4] if user_row and user_row[4] else "unknown"
+    }
+    # Don't cache the defaults for a missing user
+    if user_row:
+        profile_cache.set(user_id, user_profile)
+    return user_profile
+
+
+def load_conversation(user_id, conversation_id):
+    """Current title and last CHAT_HISTORY_MAX_ROWS messages (chronological, as chat messages) of a conversation."""
+    with DB_QUERY_SECONDS.time(group="chat_history"):
+        with pooled_connection() as conn:
+            history_cursor = conn.cursor()
+            history_cursor.execute("SELECT title FROM conversations WHERE id = %s AND user_id = %s", (conversation_id, user_id))
+            title_row = history_cursor.fetchone()
+            history_cursor.execute(queries.CHAT_HISTORY, (user_id, conversation_id, CHAT_HISTORY_MAX_ROWS))
+            history_rows = history_cursor.fetchall()
+            history_cursor.close()
+
+    # Reverse to get chronological order
+    conversation_history = []
+    for row in reversed(history_rows):
+        msg_type, content = row
+        role = "assistant" if msg_type == "bot" else "user"
+        conversation_history.append({"role": role, "content": content})
+    return {"title": title_row[0] if title_row else None, "history": conversation_history}
+
+
+def _timed_stage(fn, *args):
+    """Run one chat stage, return (result, elapsed milliseconds)."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def encode_cursor(values):
+    """Opaque pagination cursor for the sort-key values of the last row on a page."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    padded = token + "=" * (-len(token) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def page_params(cursor_size):
+    """Read ?limit= and ?cursor= for keyset pagination.
+
+    Returns (None, None) when neither is given, meaning the caller wants the
+    old unpaginated list. Raises ValueError on bad input, including a cursor
+    that doesn't hold ``cursor_size`` values.
+    """
+    raw_limit = request.args.get("limit")
+    raw_cursor = request.args.get("cursor")
+    if raw_limit is None and raw_cursor is None:
+        return None, None
+
+    try:
+        limit = int(raw_limit) if raw_limit is not None else PAGE_DEFAULT_LIMIT
+    except ValueError:
+        raise ValueError("limit must be a number")
+    limit = max(1, min(limit, PAGE_MAX_LIMIT))
+
+    after = decode_cursor(raw_cursor) if raw_cursor else None
+    if after is not None and len(after) != cursor_size:
+        raise ValueError("Invalid cursor")
+    return limit, after
+
+
+def page_response(items, rows, limit, cursor_values):
+    """Page body; ``rows`` holds up to limit + 1 rows so we know if there is more."""
+    next_cursor = encode_cursor(cursor_values(rows[limit - 1])) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
 @app.route("/", methods=["GET"])
 def home():
-    ensure_db_connection()
+    db = get_db()
+    cursor = db.cursor()
     try:
         cursor.execute("SELECT 1")
         return {"status": "Backend running! MySQL connected."}
     except Exception as e:
         return {"status": f"Backend running! MySQL error: {str(e)}"}
 
-@app.route("/api/chat", methods=["POST"])
-def chat():
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_latency(response):
+    start = g.pop("request_start", None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - start, route=route, method=request.method, status=response.status_code
+        )
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus text format: histograms / counters plus the runtime stats as gauges."""
+    body = metrics.render()
+    body += render_stats("emotion_batcher", get_batcher_stats())
+    body += render_stats("translation", get_translation_stats())
+    body += render_stats("db_pool", db_pool.pool.stats())
+    body += render_stats("llm_client", llm.stats())
+    body += render_stats("token_cache", token_cache.stats())
+    body += render_stats("profile_cache", profile_cache.stats())
+    body += render_stats("insight_cache", insight_cache.stats())
+    if turn_writer is not None:
+        body += render_stats("write_behind", turn_writer.stats())
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/admin/profile", methods=["GET"])
+def admin_profile():
+    """Sample the stacks of this worker process for a while (admins only).
+
+    Query: seconds (default 10, at most PROFILE_MAX_SECONDS), mode ("wall"
+    or "cpu"), interval_ms (default 5), idle=1 to keep threads that are
+    only waiting for work. Returns collapsed stacks (text/plain) for
+    flamegraph.pl / speedscope. Only one profile runs at a time (409
+    otherwise); the request blocks for the whole run.
+    """
     user_id = verify_token()
     if not user_id:
         return jsonify({"error": "Unauthorized"}), 401
+    if user_id not in ADMIN_USER_IDS:
+        return jsonify({"error": "Forbidden"}), 403
 
-    data = request.json
+    try:
+        seconds = float(request.args.get("seconds", 10))
+        interval = float(request.args.get("interval_ms", 5)) / 1000
+    except ValueError:
+        return jsonify({"error": "seconds and interval_ms must be numbers"}), 400
+    if not 0 < seconds <= PROFILE_MAX_SECONDS or not 0.001 <= interval <= 1:
+        return jsonify({"error": f"seconds must be in (0, {PROFILE_MAX_SECONDS}] and interval_ms in [1, 1000]"}), 400
+    mode = request.args.get("mode", "wall")
+    include_idle = request.args.get("idle") == "1"
+
+    logger.info("profile started", extra={"user_id": user_id, "seconds": seconds, "mode": mode})
+    try:
+        stacks = profiler.sample(seconds=seconds, interval=interval, mode=mode, include_idle=include_idle)
+    except profiler.ProfilerBusy as e:
+        return jsonify({"error": str(e)}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return Response(
+        profiler.collapse(stacks),
+        mimetype="text/plain",
+        headers={"X-Profile-Mode": mode, "X-Profile-Seconds": str(seconds), "X-Profile-Stacks": str(len(stacks))},
+    )
+
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return jsonify({"status": "ok"}), 200
+
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    """Readiness: emotion model loaded and warmed up, DB pool reachable.
+
+    Also kicks off the model warm-up if nothing has started it yet (e.g. when
+    running under a WSGI server instead of `python app.py`).
+    """
+    model_status = get_model_status()
+    if not model_status["warmed_up"] and not model_status["warming_up"]:
+        start_model_warmup()
+
+    db_ok = True
+    db_error = None
+    try:
+        with pooled_connection(timeout=1) as conn:
+            check_cursor = conn.cursor()
+            check_cursor.execute("SELECT 1")
+            check_cursor.fetchall()
+            check_cursor.close()
+    except Exception as e:
+        db_ok = False
+        db_error = str(e)
+
+    ready = model_status["warmed_up"] and db_ok
+    return jsonify({
+        "ready": ready,
+        "model": model_status,
+        "database": {"ok": db_ok, "error": db_error, "pool": db_pool.pool.stats()},
+        "write_behind": turn_writer.stats() if turn_writer is not None else None,
+        "caches": {"token": token_cache.stats(), "profile": profile_cache.stats()},
+        "llm": llm.stats()
+    }), (200 if ready else 503)
+
+
+def prepare_chat_turn(user_id, data):
+    """Everything a chat turn needs before the LLM call.
+
+    Creates the conversation if none was given, runs the profile / emotion /
+    history stages and builds the messages for the completion request.
+    Every query uses its own short pooled_connection() block, so no
+    connection is held across the stages or the LLM call.
+    """
     user_message = data.get("text", "")
     emojis = data.get("emojis", [])
     intensity = data.get("intensity", 50)
     conversation_id = data.get("conversation_id")
 
     # If no conversation_id provided, create a new conversation
-    if not conversation_id:
-        ensure_db_connection()
-        cursor.execute("INSERT INTO conversations (user_id, title) VALUES (%s, %s)", (user_id, "New Chat"))
-        conversation_id = cursor.lastrowid
-        db.commit()
+    was_new_conversation = not conversation_id
+    if was_new_conversation:
+        with DB_QUERY_SECONDS.time(group="chat_create_conversation"):
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("INSERT INTO conversations (user_id, title) VALUES (%s, %s)", (user_id, "New Chat"))
+                conversation_id = cursor.lastrowid
+                conn.commit()
+                cursor.close()
+
+    # --- Build enriched text for better emotion detection ---
+    enriched_text = user_message
+
+    # Add emojis if selected
+    if emojis:
+        enriched_text += " " + " ".join(emojis)
+
+    # Add intensity context
+    if intensity < 33:
+        enriched_text += " (emotion intensity: low)"
+    elif intensity > 66:
+        enriched_text += " (emotion intensity: high)"
+
+    # --- Profile, emotion and history don't depend on each other: run them concurrently ---
+    stages_start = time.perf_counter()
+    stage_futures = {
+        "profile": chat_stage_executor.submit(_timed_stage, load_user_profile, user_id),
+        "emotion": chat_stage_executor.submit(_timed_stage, predict_emotion_with_scores, enriched_text),
+    }
+    # A conversation created just now has no history yet
+    if not was_new_conversation:
+        stage_futures["conversation"] = chat_stage_executor.submit(
+            _timed_stage, load_conversation, user_id, conversation_id
+        )
 
-    # Get user profile for personalization
-    ensure_db_connection()
-    cursor.execute("SELECT name, gender, course, education_level, race FROM users WHERE id = %s", (user_id,))
-    user_row = cursor.fetchone()
-    user_profile = {
-        "name": user_row[0] if user_row else "Student",
-        "gender": user_row[1] if user_row and user_row[1] else "unknown",
-        "course": user_row[2] if user_row and user_row[2] else "unknown",
-        "education_level": user_row[3] if user_row and user_row[3] else "university",
-        "race": user_row[4] if user_row and user_row[4] else "unknown"
+    stage_results = {}
+    stage_timings = {}
+    for name, future in stage_futures.items():
+        stage_results[name], stage_timings[name] = future.result()
+    logger.info("chat stages", extra={
+        **{f"{name}_ms": round(ms, 1) for name, ms in stage_timings.items()},
+        "wall_ms": round((time.perf_counter() - stages_start) * 1000, 1),
+    })
+
+    user_profile = stage_results["profile"]
+    emotion, sentiment, scores = stage_results["emotion"]
+    conversation = stage_results.get("conversation", {"title": "New Chat", "history": []})
+    conversation_history = conversation["history"]
+
+    # Map emotion to sentiment if needed
+    sentiment = emotion_to_sentiment.get(emotion, sentiment)
+
+    # --- Static system prompt + history within budget + per-turn context ---
+    messages, prompt_info = build_chat_messages(
+        user_profile, emotion, sentiment, conversation_history, user_message, CHAT_HISTORY_TOKEN_BUDGET
+    )
+    logger.info("chat prompt", extra=prompt_info)
+
+    return {
+        "conversation_id": conversation_id,
+        "user_message": user_message,
+        "emojis": emojis,
+        "needs_title": conversation["title"] == "New Chat",
+        "emotion": emotion,
+        "sentiment": sentiment,
+        "scores": scores,
+        "messages": messages,
     }
 
-    try:
-        # --- Build enriched text for better emotion detection ---
-        enriched_text = user_message
-
-        # Add emojis if selected
-        if emojis:
-            enriched_text += " " + " ".join(emojis)
-
-        # Add intensity context
-        if intensity < 33:
-            enriched_text += " (emotion intensity: low)"
-        elif intensity > 66:
-            enriched_text += " (emotion intensity: high)"
-
-        # --- Predict emotion using enriched text ---
-        emotion, sentiment = predict_emotion_and_sentiment(enriched_text)
-
-        # Map emotion to sentiment if needed
-        sentiment = emotion_to_sentiment.get(emotion, sentiment)
-
-        # --- Generate chatbot reply with personalized system prompt ---
-        system_prompt = f"""
-You are an advanced emotional support AI for students. Your responses MUST feel natural and conversational—exactly like ChatGPT or Gemini.
-
-CRITICAL FORMATTING RULE: NEVER use numbered lists (1., 2., 3.) or bullet points (•, -, *). ONLY use natural paragraphs with line breaks.
-
-═══════════════════════════════════════════════════════════════════════
-
-STUDENT PROFILE:
-• Name: {user_profile['name']}
-• Gender: {user_profile['gender']}
-• Course: {user_profile['course']}
-• Education Level: {user_profile['education_level']}
-
-CURRENT EMOTIONAL STATE:
-• Detected Emotion: {emotion}
-• Sentiment: {sentiment}
-
-═══════════════════════════════════════════════════════════════════════
-
-HOW TO RESPOND (CRITICAL - READ CAREFULLY):
-
-1. CONVERSATIONAL FLOW
-   You have access to the FULL conversation history. Build on it naturally!
-   
-   ✅ If they agree to something you suggested, acknowledge and continue
-   ✅ Reference what was discussed earlier
-   ✅ Let the conversation flow organically
-   
-   ❌ DON'T reset with "What would you like to focus on?"
-   ❌ DON'T treat each message as isolated
-   ❌ DON'T ask the same question twice
-
-2. GENDER-AWARE RESPONSES
-   
-   For MALE students ({user_profile['gender']}):
-   • Often prefer practical, action-oriented advice
-   • May struggle to express vulnerability
-   • Validate that it's okay to feel emotions
-   • Use phrases like "It takes strength to acknowledge this"
-   
-   For FEMALE students:
-   • Often appreciate emotional validation first
-   • May benefit from empathetic listening
-   • Be aware of perfectionism pressures
-   • Use phrases like "Your feelings are completely valid"
-   
-   For NON-BINARY/OTHER:
-   • Be especially affirming and inclusive
-   • Avoid gendered assumptions
-   • Create a safe, judgment-free space
-
-3. FORMATTING - THIS IS CRITICAL!
-   
-   DEFAULT: Use natural paragraphs (like Gemini/ChatGPT)
-   EXCEPTION: If the user EXPLICITLY asks for a list, numbered steps, or bullet points, provide them.
-   
-   Examples of when to use lists:
-   ✅ "Can you give me a list of study tips?"
-   ✅ "What are 5 ways to reduce stress?"
-   ✅ "Give me steps to improve my sleep"
-   ✅ "Can you number the things I should do?"
-   
-   Examples of when NOT to use lists (default to paragraphs):
-   ❌ "I feel tired and sad" (they didn't ask for a list)
-   ❌ "How can I feel better?" (general question, use natural flow)
-   ❌ "I'm stressed about exams" (emotional support, not a list request)
-   
-   ❌ BAD (Unsolicited numbered list):
-   "Here are some tips: 1. Take a break 2. Get rest 3. Relax"
-   "1. **Take a Break**: Even a few minutes..."
-   
-   ✅ GOOD (Natural paragraphs - DEFAULT):
-   "I'm really sorry you're feeling this way. It's tough to manage everything, especially in computer science. 
-   
-   How about taking a short break? Even a few minutes to step away can be refreshing. Maybe listen to some music or do a quick stretching routine.
-   
-   Also, sometimes feeling tired can come from not finding the right balance in tasks. Are there specific subjects or assignments feeling heavier? What do you think might help you recharge a bit today?"
-   
-   ✅ ALSO GOOD (When user asks for a list):
-   User: "Can you give me 5 study tips?"
-   Bot: "Absolutely! Here are 5 study tips that can help:
-   
-   1. **Pomodoro Technique**: Study for 25 minutes, then take a 5-minute break
-   2. **Active Recall**: Test yourself instead of just re-reading notes
-   3. **Spaced Repetition**: Review material at increasing intervals
-   4. **Study Environment**: Find a quiet, dedicated space
-   5. **Sleep Well**: Get 7-8 hours—your brain consolidates learning during sleep
-   
-   Which of these sounds most helpful for your current situation?"
-
-4. RESPONSE STRUCTURE (60-120 words)
-   
-   Write in 2-3 natural paragraphs separated by blank lines:
-   
-   Paragraph 1: Empathy + understanding their situation
-   
-   Paragraph 2: Specific advice or support (NO LISTS!)
-   
-   Paragraph 3: Thoughtful follow-up question
-   
-   Use line breaks (\n\n) between paragraphs for readability.
-
-5. EMOTION-SPECIFIC STYLES
-
-   SADNESS/NEGATIVE:
-   Start with validation, offer gentle support, ask what's weighing on them.
-   
-   Example: "I'm really sorry you're going through this. Feeling exhausted from studying is so real, especially in {user_profile['course']}.
-   
-   Have you been able to take any breaks, or has it been non-stop? Sometimes even a short walk or quick nap can help reset your energy. What do you think would feel most helpful right now?"
-
-   JOY/POSITIVE:
-   Match their energy, celebrate genuinely, ask what worked.
-   
-   Example: "That's awesome! 🎉 Sounds like your hard work is really paying off.
-   
-   What do you think made the difference this time? It's great to see you feeling positive about your progress!"
-
-   ANXIETY/FEAR:
-   Be calming, break things down, offer concrete next steps.
-   
-   Example: "Overthinking can spiral so quickly, I totally get it. Let's tackle this one piece at a time.
-   
-   What's the most pressing thing on your mind right now? Sometimes just naming it can help reduce the overwhelm."
-
-   ANGER/FRUSTRATION:
-   Validate without judgment, help them process.
-   
-   Example: "That frustration makes total sense. When things feel unfair or out of your control, it's natural to feel angry.
-   
-   What happened that triggered this? Let's talk through it together."
-
-   NEUTRAL:
-   Be helpful and conversational.
-   
-   Example: "Sure, I'm here to help! What's on your mind today?"
-
-6. WHAT MAKES IT FEEL LIKE GEMINI/CHATGPT
-   
-   ✅ Natural, flowing paragraphs (NOT lists)
-   ✅ Conversational tone (like texting a friend)
-   ✅ Reference specific details they mentioned
-   ✅ Use their name occasionally
-   ✅ Show you remember the conversation
-   ✅ Ask thoughtful follow-up questions
-   
-   ❌ Numbered lists or bullet points in responses
-   ❌ Bold headers like "**Take a Break**:"
-   ❌ Clinical language ("I'm sensing...")
-   ❌ Generic advice that could apply to anyone
-   ❌ Repetitive opening phrases
-
-7. CRISIS PROTOCOL
-   If they mention self-harm, suicide, or immediate danger:
-   Respond with gentle concern and suggest professional resources.
-   
-   Otherwise, focus on emotional support and practical guidance.
-
-═══════════════════════════════════════════════════════════════════════
-
-EXAMPLE RESPONSES (STUDY THESE CAREFULLY):
-
-User (male, sad): "I feel really tired this day and it make me so sad"
-
-❌ BAD (Uses numbered list):
-"It sounds like you're feeling tired and sad. Here are some tips: 1. **Take a Break**: Even a few minutes to step away can be refreshing. 2. **Reflect on Your Workload**: Sometimes feeling tired comes from not finding balance."
-
-✅ GOOD (Natural paragraphs):
-"I'm really sorry you're feeling this way, {user_profile['name']}. It's tough to manage everything, especially in a demanding field like computer science. Feeling worn out and sad is valid, and it's okay to acknowledge that.
-
-How about considering these options? Taking a short break—even a few minutes to step away—can be refreshing. Maybe listen to some music or do a quick stretching routine. Also, sometimes feeling tired can come from not finding the right balance in tasks.
-
-Are there specific subjects or assignments feeling heavier? What do you think might help you recharge a bit today?"
-
----
-
-User (continuing conversation): "yes"
-
-❌ BAD (Resets conversation):
-"Great! What would you like to focus on today?"
-
-✅ GOOD (Continues flow):
-"Awesome! Let's start with that 5-minute break idea. Set a timer, step away from your desk, and do something completely different—stretch, grab a snack, or just look out the window.
-
-After that, we can talk about balancing your workload if you want. Sound good?"
-
-═══════════════════════════════════════════════════════════════════════
-
-FINAL REMINDER: 
-- DEFAULT: Write in NATURAL PARAGRAPHS (like Gemini/ChatGPT)
-- EXCEPTION: Use numbered lists/bullets ONLY if user explicitly asks for them
-- Separate ideas with blank lines
-- Be conversational and flowing
-- Build on conversation history
-
-You're having a CONVERSATION, not writing a manual. Be natural, contextual, and genuinely helpful.
-"""
 
-        # Get recent conversation history for context (last 5 exchanges)
-        ensure_db_connection()
-        cursor.execute(
-            "SELECT message_type, content FROM chat_logs WHERE user_id = %s AND conversation_id = %s ORDER BY timestamp DESC LIMIT 10",
-            (user_id, conversation_id)
-        )
-        history_rows = cursor.fetchall()
-        
-        # Build conversation history (reverse to get chronological order)
-        conversation_history = []
-        for row in reversed(history_rows):
-            msg_type, content = row
-            role = "assistant" if msg_type == "bot" else "user"
-            conversation_history.append({"role": role, "content": content})
-
-        # Build messages array with history
-        messages = [{"role": "system", "content": system_prompt}]
-        messages.extend(conversation_history)  # Add conversation context
-        messages.append({"role": "user", "content": user_message})  # Add current message
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-        )
+def save_chat_turn(user_id, turn, bot_reply, new_title=None):
+    """Persist a finished chat turn (check-in, rollup, both chat log rows,
+    conversation timestamp and title) in one transaction.
+
+    With CHAT_WRITE_BEHIND the turn is queued for the background writer
+    instead; if that queue is full it is written here synchronously, on a
+    connection checked out only for the write.
+    """
+    emojis = turn["emojis"]
+    record = make_chat_turn(
+        user_id,
+        turn["conversation_id"],
+        turn["user_message"],
+        bot_reply,
+        turn["emotion"],
+        turn["sentiment"],
+        emoji=emojis[0] if emojis else None,
+        new_title=new_title,
+        scores=turn["scores"],
+    )
+    if turn_writer is not None and turn_writer.submit(record):
+        return
+    with pooled_connection() as conn:
+        persist_chat_turns(conn, [record])
+
+
+def generate_conversation_title(user_message):
+    """Very short title for a "New Chat" conversation, generated from its first message."""
+    title_response = llm.complete(
+        call="title",
+        messages=[
+            {"role": "system", "content": "Generate a very concise (3-5 words) title for this conversation based on the first message. No quotes."},
+            {"role": "user", "content": f"User: {user_message}"}
+        ],
+    )
+    return title_response.choices[0].message.content.strip().replace('"', '')
 
-        bot_reply = response.choices[0].message.content
 
+def start_title_generation(turn):
+    """Generate the title alongside the reply for conversations still called "New Chat"."""
+    if not turn["needs_title"]:
+        return None
+    return llm_executor.submit(generate_conversation_title, turn["user_message"])
 
-        # Save user checkin
-        ensure_db_connection()
-        now = datetime.datetime.now()
-        date_str = now.strftime("%Y-%m-%d")
-        time_str = now.strftime("%H:%M:%S")
-        cursor.execute(
-            "INSERT INTO checkins (user_id, date, time, emotion, sentiment, emoji) VALUES (%s, %s, %s, %s, %s, %s)",
-            (user_id, date_str, time_str, emotion, sentiment, emojis[0] if emojis else None)
-        )
 
-        # Save chat logs
-        ensure_db_connection()
-        cursor.execute(
-            "INSERT INTO chat_logs (user_id, message_type, content, emotion, sentiment, conversation_id) VALUES (%s, %s, %s, %s, %s, %s)",
-            (user_id, 'user', user_message, emotion, sentiment, conversation_id)
-        )
-        ensure_db_connection()
-        cursor.execute(
-            "INSERT INTO chat_logs (user_id, message_type, content, conversation_id) VALUES (%s, %s, %s, %s)",
-            (user_id, 'bot', bot_reply, conversation_id)
-        )
+def title_result(title_future):
+    if title_future is None:
+        return None
+    try:
+        return title_future.result()
+    except Exception as e:
+        logger.warning("Auto-rename failed: %s", e)
+        return None
 
-        # Update conversation timestamp
-        ensure_db_connection()
-        cursor.execute("UPDATE conversations SET updated_at = CURRENT_TIMESTAMP WHERE id = %s", (conversation_id,))
 
-        db.commit()
+@app.route("/api/chat", methods=["POST"])
+def chat():
+    user_id = verify_token()
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 401
 
-        # --- Auto-Rename Conversation if it's a "New Chat" ---
-        ensure_db_connection()
-        cursor.execute("SELECT title FROM conversations WHERE id = %s", (conversation_id,))
-        row = cursor.fetchone()
-        if row and row[0] == "New Chat":
-            try:
-                title_response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": "Generate a very concise (3-5 words) title for this conversation based on the first message. No quotes."},
-                        {"role": "user", "content": f"User: {user_message}"}
-                    ],
+    data = request.json
 
+    try:
+        turn = prepare_chat_turn(user_id, data)
 
-                )
-                new_title = title_response.choices[0].message.content.strip().replace('"', '')
-                cursor.execute("UPDATE conversations SET title = %s WHERE id = %s", (new_title, conversation_id))
-                db.commit()
-            except Exception as e:
-                print(f"Auto-rename failed: {e}")
+        # --- Auto-Rename Conversation if it's a "New Chat" (runs alongside the reply) ---
+        title_future = start_title_generation(turn)
+
+        response = llm.complete(messages=turn["messages"])
+
+        bot_reply = response.choices[0].message.content
+
+        save_chat_turn(user_id, turn, bot_reply, new_title=title_result(title_future))
 
         return jsonify({
             "reply": bot_reply,    
-            "emotion": emotion,    
-            "sentiment": sentiment
+            "emotion": turn["emotion"],    
+            "sentiment": turn["sentiment"]
         })
 
     except Exception as e:
-        print("Backend error:", e)
+        ERRORS.inc(component="chat")
+        logger.exception("Chat error")
+        return jsonify({"error": str(e)}), 500
+
+
+def sse_event(event, payload):
+    """Format one Server-Sent Events message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@app.route("/api/chat/stream", methods=["POST"])
+def chat_stream():
+    """Streaming variant of /api/chat over Server-Sent Events.
+
+    Events, in order:
+      emotion  {"emotion", "sentiment", "conversation_id"} as soon as it is detected
+      token    {"content"} for every piece of the reply as the LLM produces it
+      done     {"reply", "emotion", "sentiment", "conversation_id", "title"} after
+               the reply is saved to chat_logs (title is set when a new
+               conversation was renamed)
+      error    {"error"} if anything fails (nothing is saved in that case)
+    """
+    user_id = verify_token()
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    data = request.json or {}
+
+    def generate():
+        # Send something right away so the client sees the first byte immediately
+        yield ": stream opened\n\n"
+        try:
+            turn = prepare_chat_turn(user_id, data)
+            yield sse_event("emotion", {
+                "emotion": turn["emotion"],
+                "sentiment": turn["sentiment"],
+                "conversation_id": turn["conversation_id"]
+            })
+
+            title_future = start_title_generation(turn)
+
+            reply_parts = []
+            for delta in llm.stream(messages=turn["messages"]):
+                reply_parts.append(delta)
+                yield sse_event("token", {"content": delta})
+
+            bot_reply = "".join(reply_parts)
+            new_title = title_result(title_future)
+            save_chat_turn(user_id, turn, bot_reply, new_title=new_title)
+            yield sse_event("done", {
+                "reply": bot_reply,
+                "emotion": turn["emotion"],
+                "sentiment": turn["sentiment"],
+                "conversation_id": turn["conversation_id"],
+                "title": new_title
+            })
+
+        except Exception as e:
+            ERRORS.inc(component="chat_stream")
+            logger.exception("Chat stream error")
+            yield sse_event("error", {"error": str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/analyze/batch", methods=["POST"])
+def analyze_batch():
+    user_id = verify_token()
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    data = request.get_json() or {}
+    texts = data.get("texts")
+
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        return jsonify({"error": "texts must be a list of strings"}), 400
+    if len(texts) > ANALYZE_BATCH_MAX_TEXTS:
+        return jsonify({"error": f"At most {ANALYZE_BATCH_MAX_TEXTS} texts per request"}), 400
+
+    try:
+        results = predict_emotions_batch(texts)
+    except Exception as e:
+        ERRORS.inc(component="analyze_batch")
+        logger.exception("Batch analysis error")
         return jsonify({"error": str(e)}), 500
 
+    return jsonify({
+        "labels": EMOTION_LABELS,
+        "results": results
+    })
+
 
 @app.route("/register", methods=["POST"])
 def register():
@@ -462,18 +656,20 @@ def register():
     if not all([name, email, password, course, gender, date_of_birth, education_level, race]):
         return jsonify({"message": "All fields are required"}), 400
 
-    ensure_db_connection()
-    cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
-    if cursor.fetchone():
-        return jsonify({"message": "Email already registered"}), 400
+    db = get_db()
+    cursor = db.cursor()
+    with DB_QUERY_SECONDS.time(group="register_email_check"):
+        cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
+        if cursor.fetchone():
+            return jsonify({"message": "Email already registered"}), 400
 
     password_hash = generate_password_hash(password)
-    ensure_db_connection()
-    cursor.execute(
-        "INSERT INTO users (name, email, password_hash, course, gender, date_of_birth, education_level, race) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
-        (name, email, password_hash, course, gender, date_of_birth, education_level, race),
-    )
-    db.commit()
+    with DB_QUERY_SECONDS.time(group="register_insert"):
+        cursor.execute(
+            "INSERT INTO users (name, email, password_hash, course, gender, date_of_birth, education_level, race) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+            (name, email, password_hash, course, gender, date_of_birth, education_level, race),
+        )
+        db.commit()
     return jsonify({"message": "Registered"}), 201
 
 
@@ -483,11 +679,82 @@ def get_checkins():
     if not user_id:
         return jsonify({"error": "Unauthorized"}), 401
 
-    ensure_db_connection()
-    cursor.execute("SELECT id, date, time, emotion, sentiment, emoji FROM checkins WHERE user_id = %s ORDER BY date DESC, time DESC", (user_id,))
-    rows = cursor.fetchall()
-    checkins = [{"id": r[0], "date": str(r[1]), "time": str(r[2]), "emotion": r[3], "sentiment": r[4], "emoji": r[5]} for r in rows]
-    return jsonify(checkins)
+    try:
+        limit, after = page_params(3)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    db = get_db()
+    cursor = db.cursor()
+
+    if limit is None:
+        # Full history (backward compatible)
+        with DB_QUERY_SECONDS.time(group="checkins_list"):
+            cursor.execute(queries.CHECKINS_LIST, (user_id,))
+            rows = cursor.fetchall()
+        checkins = [{"id": r[0], "date": str(r[1]), "time": str(r[2]), "emotion": r[3], "sentiment": r[4], "emoji": r[5]} for r in rows]
+        return jsonify(checkins)
+
+    # Keyset page, newest first, cursor = (date, time, id) of the last row
+    with DB_QUERY_SECONDS.time(group="checkins_list"):
+        if after:
+            after_date, after_time, after_id = after
+            cursor.execute(
+                queries.CHECKINS_PAGE_AFTER,
+                (user_id, after_date, after_date, after_time, after_time, after_id, limit + 1)
+            )
+        else:
+            cursor.execute(queries.CHECKINS_PAGE, (user_id, limit + 1))
+        rows = cursor.fetchall()
+    checkins = [{"id": r[0], "date": str(r[1]), "time": str(r[2]), "emotion": r[3], "sentiment": r[4], "emoji": r[5]} for r in rows[:limit]]
+    return jsonify(page_response(checkins, rows, limit, lambda r: [str(r[1]), str(r[2]), r[0]]))
+
+
+@app.route("/api/checkins/daily", methods=["GET"])
+def get_checkins_daily():
+    """Per-day emotion and sentiment counts from the rollup table (for the dashboard).
+
+    With ?scores=1 each day also gets the mean of the model score vectors
+    of its check-ins ("mean_scores", null if none were scored), from the
+    score totals kept in the same rollup rows.
+    """
+    user_id = verify_token()
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        days = max(1, min(int(request.args.get("days", 30)), 366))
+    except ValueError:
+        return jsonify({"error": "days must be a number"}), 400
+    since = datetime.date.today() - datetime.timedelta(days=days - 1)
+
+    db = get_db()
+    cursor = db.cursor()
+    with DB_QUERY_SECONDS.time(group="checkins_daily"):
+        cursor.execute(
+            f"SELECT day, emotion, sentiment, count, {', '.join(ROLLUP_COLUMNS)} FROM checkin_daily_rollups "
+            "WHERE user_id = %s AND day >= %s ORDER BY day DESC",
+            (user_id, since)
+        )
+        rows = cursor.fetchall()
+
+    with_scores = request.args.get("scores") in ("1", "true")
+    daily = {}
+    score_totals = {}
+    for day, emotion, sentiment, count, *totals in rows:
+        entry = daily.setdefault(str(day), {"date": str(day), "total": 0, "emotions": {}, "sentiments": {}})
+        entry["total"] += count
+        entry["emotions"][emotion] = entry["emotions"].get(emotion, 0) + count
+        entry["sentiments"][sentiment] = entry["sentiments"].get(sentiment, 0) + count
+        day_totals = score_totals.setdefault(str(day), [0] * len(ROLLUP_COLUMNS))
+        for i, value in enumerate(totals):
+            day_totals[i] += int(value)
+
+    if with_scores:
+        for day, entry in daily.items():
+            entry["mean_scores"] = summarize_rollup(score_totals[day], EMOTION_LABELS)["mean_scores"]
+
+    return jsonify(list(daily.values()))
 
 
 @app.route("/api/chat_logs", methods=["GET"])
@@ -496,19 +763,100 @@ def get_chat_logs():
     if not user_id:
         return jsonify({"error": "Unauthorized"}), 401
 
+    try:
+        limit, after = page_params(2)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    db = get_db()
+    cursor = db.cursor()
+
     conversation_id = request.args.get('conversation_id')
+
+    if limit is None:
+        with DB_QUERY_SECONDS.time(group="chat_logs_list"):
+            if conversation_id:
+                # Get logs for specific conversation
+                cursor.execute(queries.CONVERSATION_LOGS_LIST, (user_id, conversation_id))
+            else:
+                # Get all logs (for backward compatibility)
+                cursor.execute(queries.CHAT_LOGS_LIST, (user_id,))
+
+            rows = cursor.fetchall()
+        logs = [{"id": r[0], "type": r[1], "content": r[2], "emotion": r[3], "sentiment": r[4], "timestamp": str(r[5])} for r in rows]
+        return jsonify(logs)
+
+    # Keyset page, oldest first, cursor = (timestamp, id) of the last row
+    params = [user_id]
     if conversation_id:
-        # Get logs for specific conversation
-        ensure_db_connection()
-        cursor.execute("SELECT id, message_type, content, emotion, sentiment, timestamp FROM chat_logs WHERE user_id = %s AND conversation_id = %s ORDER BY timestamp ASC", (user_id, conversation_id))
+        sql = queries.CONVERSATION_LOGS_PAGE_AFTER if after else queries.CONVERSATION_LOGS_PAGE
+        params.append(conversation_id)
     else:
-        # Get all logs (for backward compatibility)
-        ensure_db_connection()
-        cursor.execute("SELECT id, message_type, content, emotion, sentiment, timestamp FROM chat_logs WHERE user_id = %s ORDER BY timestamp ASC", (user_id,))
+        sql = queries.CHAT_LOGS_PAGE_AFTER if after else queries.CHAT_LOGS_PAGE
+    if after:
+        after_timestamp, after_id = after
+        params.extend([after_timestamp, after_timestamp, after_id])
+    params.append(limit + 1)
+
+    with DB_QUERY_SECONDS.time(group="chat_logs_list"):
+        cursor.execute(sql, tuple(params))
+        rows = cursor.fetchall()
+        logs = [{"id": r[0], "type": r[1], "content": r[2], "emotion": r[3], "sentiment": r[4], "timestamp": str(r[5])} for r in rows[:limit]]
+    return jsonify(page_response(logs, rows, limit, lambda r: [str(r[5]), r[0]]))
+
 
-    rows = cursor.fetchall()
-    logs = [{"id": r[0], "type": r[1], "content": r[2], "emotion": r[3], "sentiment": r[4], "timestamp": str(r[5])} for r in rows]
-    return jsonify(logs)
+def insight_fingerprint(most_common_emotion, positive_percent, neutral_percent, negative_percent):
+    """Coarse summary of a pattern; small shifts in the percentages map to the same key."""
+    def bucket(percent):
+        return int(round(percent / INSIGHT_BUCKET_PERCENT)) * INSIGHT_BUCKET_PERCENT
+
+    return (most_common_emotion, bucket(positive_percent), bucket(neutral_percent), bucket(negative_percent))
+
+
+def generate_insight_text(most_common_emotion, positive_percent, neutral_percent, negative_percent):
+    insight_response = llm.complete(
+        call="insight",
+        messages=[
+            {
+                "role": "system", 
+                "content": """You are an emotional wellness analyst. Provide a brief, clear summary of the user's emotional pattern. 
+Use simple, everyday language that anyone can understand. Avoid complex or academic words.
+Format: "Your emotions show [pattern]. [One simple observation]."
+Max 2 sentences, 30 words total. Be warm, clear, and easy to understand."""
+            },
+            {
+                "role": "user", 
+                "content": f"Pattern: {most_common_emotion} is most common. Sentiment: {positive_percent}% positive, {neutral_percent}% neutral, {negative_percent}% negative."
+            }
+        ],
+    )
+    return insight_response.choices[0].message.content.strip().replace('"', '')
+
+
+def generate_motivation_text(most_common_emotion, positive_percent):
+    motivation_response = llm.complete(
+        call="motivation",
+        messages=[
+            {
+                "role": "system",
+                "content": """Generate an inspiring, uplifting quote relevant to the user's emotional state. 
+Create an original motivational message - do NOT include any author attribution or quotation marks.
+Keep it under 25 words. Be authentic and encouraging."""
+            },
+            {
+                "role": "user",
+                "content": f"User feels {most_common_emotion} most often. {positive_percent}% positive emotions overall."
+            }
+        ],
+    )
+    return motivation_response.choices[0].message.content.strip().replace('"', '')
+
+
+def load_insight_rollups(cursor, user_id, since):
+    """Counts and score totals per (emotion, sentiment) for rollup days from ``since`` on."""
+    with DB_QUERY_SECONDS.time(group="insight_rollups"):
+        cursor.execute(queries.INSIGHT_ROLLUPS, (user_id, since))
+        return cursor.fetchall()
 
 
 @app.route("/api/insight", methods=["GET"])
@@ -517,10 +865,18 @@ def get_insight():
     if not user_id:
         return jsonify({"error": "Unauthorized"}), 401
 
-    ensure_db_connection()
-    # Fetch recent checkins for comprehensive analysis (last 30 days)
-    cursor.execute("SELECT date, time, emotion, sentiment FROM checkins WHERE user_id = %s ORDER BY date DESC, time DESC LIMIT 50", (user_id,))
-    rows = cursor.fetchall()
+    db = get_db()
+    cursor = db.cursor()
+    # Aggregate recent check-ins from the daily rollups (last INSIGHT_WINDOW_DAYS days)
+    since = datetime.date.today() - datetime.timedelta(days=INSIGHT_WINDOW_DAYS - 1)
+    rows = load_insight_rollups(cursor, user_id, since)
+    if not rows:
+        # Nothing recent: use the INSIGHT_WINDOW_DAYS up to the user's last check-in day
+        with DB_QUERY_SECONDS.time(group="insight_last_day"):
+            cursor.execute("SELECT MAX(day) FROM checkin_daily_rollups WHERE user_id = %s", (user_id,))
+            last_day = cursor.fetchone()[0]
+        if last_day is not None:
+            rows = load_insight_rollups(cursor, user_id, last_day - datetime.timedelta(days=INSIGHT_WINDOW_DAYS - 1))
 
     if not rows:
         return jsonify({
@@ -531,13 +887,18 @@ def get_insight():
 
     # Calculate emotional patterns
     from collections import Counter
-    emotions = [r[2] for r in rows]
-    sentiments = [r[3] for r in rows]
-    
-    emotion_counts = Counter(emotions)
-    sentiment_counts = Counter(sentiments)
+    emotion_counts = Counter()
+    sentiment_counts = Counter()
+    # Model score totals of the same check-ins: how sure the model was and how mixed they were
+    score_totals = [0] * len(ROLLUP_COLUMNS)
+    for emotion, sentiment, count, *totals in rows:
+        emotion_counts[emotion] += int(count)
+        sentiment_counts[sentiment] += int(count)
+        for i, value in enumerate(totals):
+            score_totals[i] += int(value)
+    score_summary = summarize_rollup(score_totals, EMOTION_LABELS)
     
-    total_checkins = len(rows)
+    total_checkins = sum(emotion_counts.values())
     positive_count = sentiment_counts.get("Positive", 0)
     neutral_count = sentiment_counts.get("Neutral", 0)
     negative_count = sentiment_counts.get("Negative", 0)
@@ -549,9 +910,6 @@ def get_insight():
     
     most_common_emotion = emotion_counts.most_common(1)[0][0] if emotion_counts else "Unknown"
     
-    # Format data for AI analysis
-    history_text = "\n".join([f"{r[0]} {r[1]}: {r[2]} ({r[3]})" for r in rows])
-    
     pattern_summary = f"""
 Total Check-ins: {total_checkins}
 Sentiment Distribution:
@@ -562,43 +920,21 @@ Most Common Emotion: {most_common_emotion}
 """
 
     try:
-        # Generate concise insight
-        insight_response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system", 
-                    "content": """You are an emotional wellness analyst. Provide a brief, clear summary of the user's emotional pattern. 
-Use simple, everyday language that anyone can understand. Avoid complex or academic words.
-Format: "Your emotions show [pattern]. [One simple observation]."
-Max 2 sentences, 30 words total. Be warm, clear, and easy to understand."""
-                },
-                {
-                    "role": "user", 
-                    "content": f"Pattern: {most_common_emotion} is most common. Sentiment: {positive_percent}% positive, {neutral_percent}% neutral, {negative_percent}% negative."
-                }
-            ],
-        )
-        
-        # Generate motivational quote
-        motivation_response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """Generate an inspiring, uplifting quote relevant to the user's emotional state. 
-Create an original motivational message - do NOT include any author attribution or quotation marks.
-Keep it under 25 words. Be authentic and encouraging."""
-                },
-                {
-                    "role": "user",
-                    "content": f"User feels {most_common_emotion} most often. {positive_percent}% positive emotions overall."
-                }
-            ],
-        )
-        
-        insight = insight_response.choices[0].message.content.strip().replace('"', '')
-        motivation = motivation_response.choices[0].message.content.strip().replace('"', '')
+        # Same pattern (after bucketing) as last time -> reuse the cached texts
+        fingerprint = insight_fingerprint(most_common_emotion, positive_percent, neutral_percent, negative_percent)
+        cached = insight_cache.get(user_id)
+        if cached and cached["fingerprint"] == fingerprint:
+            insight, motivation = cached["insight"], cached["motivation"]
+        else:
+            insight_future = llm_executor.submit(
+                generate_insight_text, most_common_emotion, positive_percent, neutral_percent, negative_percent
+            )
+            motivation_future = llm_executor.submit(
+                generate_motivation_text, most_common_emotion, positive_percent
+            )
+            insight = insight_future.result()
+            motivation = motivation_future.result()
+            insight_cache.set(user_id, {"fingerprint": fingerprint, "insight": insight, "motivation": motivation})
         
         return jsonify({
             "insight": insight,
@@ -611,12 +947,14 @@ Keep it under 25 words. Be authentic and encouraging."""
                     "neutral": neutral_percent,
                     "negative": negative_percent
                 },
-                "emotion_breakdown": dict(emotion_counts.most_common(3))
+                "emotion_breakdown": dict(emotion_counts.most_common(3)),
+                "emotion_scores": score_summary,
             }
         })
         
     except Exception as e:
-        print(f"Insight error: {e}")
+        ERRORS.inc(component="insight")
+        logger.warning("Insight generation failed, using fallback texts: %s", e)
         return jsonify({
             "insight": "Your emotions are valid. Keep tracking to understand yourself better.",
             "motivation": "Every step forward is progress. You're doing great!",
@@ -627,7 +965,8 @@ Keep it under 25 words. Be authentic and encouraging."""
                     "positive": positive_percent,
                     "neutral": neutral_percent,
                     "negative": negative_percent
-                }
+                },
+                "emotion_scores": score_summary,
             }
         })
 
@@ -639,20 +978,45 @@ def conversations():
         return jsonify({"error": "Unauthorized"}), 401
 
     if request.method == "GET":
-        ensure_db_connection()
-        cursor.execute("SELECT id, title, created_at, updated_at FROM conversations WHERE user_id = %s ORDER BY updated_at DESC", (user_id,))
-        rows = cursor.fetchall()
-        conversations_list = [{"id": r[0], "title": r[1], "created_at": str(r[2]), "updated_at": str(r[3])} for r in rows]
-        return jsonify(conversations_list)
+        try:
+            limit, after = page_params(2)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        db = get_db()
+        cursor = db.cursor()
+
+        if limit is None:
+            with DB_QUERY_SECONDS.time(group="conversations_list"):
+                cursor.execute(queries.CONVERSATIONS_LIST, (user_id,))
+                rows = cursor.fetchall()
+            conversations_list = [{"id": r[0], "title": r[1], "created_at": str(r[2]), "updated_at": str(r[3])} for r in rows]
+            return jsonify(conversations_list)
+
+        # Keyset page, most recently updated first, cursor = (updated_at, id)
+        with DB_QUERY_SECONDS.time(group="conversations_list"):
+            if after:
+                after_updated, after_id = after
+                cursor.execute(
+                    queries.CONVERSATIONS_PAGE_AFTER,
+                    (user_id, after_updated, after_updated, after_id, limit + 1)
+                )
+            else:
+                cursor.execute(queries.CONVERSATIONS_PAGE, (user_id, limit + 1))
+            rows = cursor.fetchall()
+        conversations_list = [{"id": r[0], "title": r[1], "created_at": str(r[2]), "updated_at": str(r[3])} for r in rows[:limit]]
+        return jsonify(page_response(conversations_list, rows, limit, lambda r: [str(r[3]), r[0]]))
 
     elif request.method == "POST":
         data = request.json or {}
         title = data.get("title", "New Chat")
 
-        ensure_db_connection()
-        cursor.execute("INSERT INTO conversations (user_id, title) VALUES (%s, %s)", (user_id, title))
-        conversation_id = cursor.lastrowid
-        db.commit()
+        db = get_db()
+        cursor = db.cursor()
+        with DB_QUERY_SECONDS.time(group="conversation_create"):
+            cursor.execute("INSERT INTO conversations (user_id, title) VALUES (%s, %s)", (user_id, title))
+            conversation_id = cursor.lastrowid
+            db.commit()
 
         return jsonify({"id": conversation_id, "title": title, "message": "Conversation created"}), 201
 
@@ -663,12 +1027,14 @@ def delete_conversation(conversation_id):
     if not user_id:
         return jsonify({"error": "Unauthorized"}), 401
 
-    ensure_db_connection()
-    # First delete all chat logs for this conversation
-    cursor.execute("DELETE FROM chat_logs WHERE conversation_id = %s AND user_id = %s", (conversation_id, user_id))
-    # Then delete the conversation
-    cursor.execute("DELETE FROM conversations WHERE id = %s AND user_id = %s", (conversation_id, user_id))
-    db.commit()
+    db = get_db()
+    cursor = db.cursor()
+    with DB_QUERY_SECONDS.time(group="conversation_delete"):
+        # First delete all chat logs for this conversation
+        cursor.execute("DELETE FROM chat_logs WHERE conversation_id = %s AND user_id = %s", (conversation_id, user_id))
+        # Then delete the conversation
+        cursor.execute("DELETE FROM conversations WHERE id = %s AND user_id = %s", (conversation_id, user_id))
+        db.commit()
 
     return jsonify({"message": "Conversation deleted"}), 200
 
@@ -685,9 +1051,11 @@ def update_conversation(conversation_id):
     if not new_title:
         return jsonify({"error": "Title is required"}), 400
 
-    ensure_db_connection()
-    # Check if conversation belongs to user
-    cursor.execute("UPDATE conversations SET title = %s WHERE id = %s AND user_id = %s", (new_title, conversation_id, user_id))
+    db = get_db()
+    cursor = db.cursor()
+    with DB_QUERY_SECONDS.time(group="conversation_update"):
+        # Check if conversation belongs to user
+        cursor.execute("UPDATE conversations SET title = %s WHERE id = %s AND user_id = %s", (new_title, conversation_id, user_id))
     
     if cursor.rowcount == 0:
         return jsonify({"error": "Conversation not found or unauthorized"}), 404
@@ -704,9 +1072,11 @@ def profile():
         return jsonify({"error": "Unauthorized"}), 401
 
     if request.method == "GET":
-        ensure_db_connection()
-        cursor.execute("SELECT name, email, course, gender, date_of_birth, education_level, race FROM users WHERE id = %s", (user_id,))
-        row = cursor.fetchone()
+        db = get_db()
+        cursor = db.cursor()
+        with DB_QUERY_SECONDS.time(group="profile_read"):
+            cursor.execute("SELECT name, email, course, gender, date_of_birth, education_level, race FROM users WHERE id = %s", (user_id,))
+            row = cursor.fetchone()
         if not row:
             return jsonify({"error": "User not found"}), 404
         return jsonify({
@@ -733,38 +1103,48 @@ def profile():
             return jsonify({"message": "Name and email required"}), 400
 
         # Check if email is taken by another user
-        ensure_db_connection()
-        cursor.execute("SELECT id FROM users WHERE email = %s AND id != %s", (email, user_id))
-        if cursor.fetchone():
-            return jsonify({"message": "Email already in use"}), 400
-
-        cursor.execute(
-            "UPDATE users SET name = %s, email = %s, course = %s, gender = %s, date_of_birth = %s, education_level = %s, race = %s WHERE id = %s",
-            (name, email, course, gender, date_of_birth, education_level, race, user_id)
-        )
-        db.commit()
+        db = get_db()
+        cursor = db.cursor()
+        with DB_QUERY_SECONDS.time(group="profile_update"):
+            cursor.execute("SELECT id FROM users WHERE email = %s AND id != %s", (email, user_id))
+            if cursor.fetchone():
+                return jsonify({"message": "Email already in use"}), 400
+
+            cursor.execute(
+                "UPDATE users SET name = %s, email = %s, course = %s, gender = %s, date_of_birth = %s, education_level = %s, race = %s WHERE id = %s",
+                (name, email, course, gender, date_of_birth, education_level, race, user_id)
+            )
+            db.commit()
+        profile_cache.delete(user_id)
         return jsonify({"message": "Profile updated"}), 200
 
     elif request.method == "DELETE":
         # Delete all associated data first (due to foreign key constraints)
-        ensure_db_connection()
+        db = get_db()
+        cursor = db.cursor()
         try:
-            # Delete chat logs
-            cursor.execute("DELETE FROM chat_logs WHERE user_id = %s", (user_id,))
-            # Delete checkins
-            cursor.execute("DELETE FROM checkins WHERE user_id = %s", (user_id,))
-            # Delete user account
-            cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
-            db.commit()
-            print(f"Account deleted successfully for user_id: {user_id}")
+            with DB_QUERY_SECONDS.time(group="profile_delete"):
+                # Delete chat logs
+                cursor.execute("DELETE FROM chat_logs WHERE user_id = %s", (user_id,))
+                # Delete checkins
+                cursor.execute("DELETE FROM checkins WHERE user_id = %s", (user_id,))
+                cursor.execute("DELETE FROM checkin_daily_rollups WHERE user_id = %s", (user_id,))
+                # Delete user account
+                cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
+                db.commit()
+            insight_cache.delete(user_id)
+            profile_cache.delete(user_id)
+            logger.info("Account deleted", extra={"user_id": user_id})
             return jsonify({"message": "Account deleted successfully"}), 200
         except mysql.connector.Error as db_error:
             db.rollback()
-            print(f"Database error during account deletion: {db_error}")
+            ERRORS.inc(component="account_delete")
+            logger.error("Database error during account deletion: %s", db_error, extra={"user_id": user_id})
             return jsonify({"message": "Database error occurred"}), 500
-        except Exception as e:
+        except Exception:
             db.rollback()
-            print(f"Unexpected error during account deletion: {e}")
+            ERRORS.inc(component="account_delete")
+            logger.exception("Unexpected error during account deletion", extra={"user_id": user_id})
             return jsonify({"message": "Failed to delete account"}), 500
 
 
@@ -777,9 +1157,11 @@ def login():
     if not (email and password):
         return jsonify({"message": "Missing fields"}), 400
 
-    ensure_db_connection()
-    cursor.execute("SELECT id, password_hash FROM users WHERE email = %s", (email,))
-    row = cursor.fetchone()
+    db = get_db()
+    cursor = db.cursor()
+    with DB_QUERY_SECONDS.time(group="login"):
+        cursor.execute(queries.LOGIN_BY_EMAIL, (email,))
+        row = cursor.fetchone()
     if not row:
         return jsonify({"message": "Invalid Email/Password"}), 401
 
@@ -793,5 +1175,22 @@ def login():
 
     return jsonify({"message": "Login successful", "token": token, "user_id": user_id}), 200
 
+def is_reloader_parent():
+    """True in the debug reloader's file-watching process, which never serves requests."""
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        return False
+    if __name__ == "__main__":
+        return True  # app.run(debug=True) below re-runs this file in a child
+    # flask run --debug imports the app in the watcher as well
+    return os.environ.get("FLASK_RUN_FROM_CLI") == "true" and os.environ.get("FLASK_DEBUG") in ("1", "true")
+
+
+# Load the model in the background as soon as the app is imported (python
+# app.py, flask run or a WSGI server), so the port binds right away and the
+# first request doesn't pay for the load. /readyz starts it too if it isn't
+# running.
+if not is_reloader_parent():
+    start_model_warmup()
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,106 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Collect single requests into small batches for one worker thread.
+
+    Callers submit one item and get a Future back. The worker waits for the
+    first item, then keeps collecting until either ``max_batch_size`` items
+    are queued or ``max_wait_ms`` has passed, and calls ``batch_fn`` once
+    with the whole list. ``batch_fn`` must return one result per item.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=16, max_wait_ms=5, name="micro-batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+        # Stats
+        self._batch_size_histogram = {}
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def submit(self, item):
+        """Queue one item and return a Future resolved with its result."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _collect(self):
+        """Block for the first item, then gather more until size or time limit."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # Still take whatever is already waiting, without blocking
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+
+            with self._lock:
+                size = len(batch)
+                self._batch_size_histogram[size] = self._batch_size_histogram.get(size, 0) + 1
+                self._batches += 1
+                self._items += size
+
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"{self.name}: batch_fn returned {len(results)} results for {len(items)} items"
+                    )
+            except Exception as e:
+                with self._lock:
+                    self._errors += 1
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+    def stats(self):
+        """Queue depth and batch-size histogram, for monitoring."""
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": self._batches,
+                "items": self._items,
+                "errors": self._errors,
+                "avg_batch_size": (self._items / self._batches) if self._batches else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_size_histogram.items())),
+            }
@@ -0,0 +1,68 @@
+"""Micro-benchmark for the emoji emotion detector.
+
+    python benchmarks/bench_emoji.py [--number 20000]
+
+Reports the per-message cost of detect_emotion_from_emojis for plain text,
+non-English text and messages with emojis, next to the old implementation
+(regex compiled on every call, debug prints removed) for comparison.
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sentiment_model import EMOJI_TO_EMOTION, detect_emotion_from_emojis  # noqa: E402
+
+MESSAGES = {
+    "plain": "I feel really tired this day and it make me so sad",
+    "non_english": "saya rasa sangat penat hari ini dan sedih",
+    "non_latin": "我今天很累，也很难过",
+    "single_emoji": "exam tomorrow 😢",
+    "emoji_run": "😢😢😢 why",
+    "multi_codepoint": "ugh ☹️ again",
+    "mixed": "passed!! 🎉✨😊 but tired 😫",
+}
+
+
+def legacy_detect(text):
+    emoji_pattern = re.compile(
+        "["
+        "\U0001F600-\U0001F64F"
+        "\U0001F300-\U0001F5FF"
+        "\U0001F680-\U0001F6FF"
+        "\U0001F1E0-\U0001F1FF"
+        "\U00002600-\U000027BF"
+        "\U0001F900-\U0001F9FF"
+        "\U00002702-\U000027B0"
+        "\U000024C2-\U0001F251"
+        "]+",
+        flags=re.UNICODE
+    )
+    counts = {}
+    for emoji in emoji_pattern.findall(text):
+        emotion = EMOJI_TO_EMOTION.get(emoji)
+        if emotion:
+            counts[emotion] = counts.get(emotion, 0) + 1
+    return max(counts, key=counts.get) if counts else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000, help="calls per message")
+    args = parser.parse_args()
+
+    print(f"{'message':<16} {'current ns/msg':>15} {'legacy ns/msg':>14}  result")
+    for name, text in MESSAGES.items():
+        current = min(timeit.repeat(lambda: detect_emotion_from_emojis(text), number=args.number, repeat=3))
+        legacy = min(timeit.repeat(lambda: legacy_detect(text), number=args.number, repeat=3))
+        print(
+            f"{name:<16} {current / args.number * 1e9:>15.0f} {legacy / args.number * 1e9:>14.0f}"
+            f"  {detect_emotion_from_emojis(text)[0]} (legacy: {legacy_detect(text)})"
+        )
+
+
+if __name__ == "__main__":
+    main()
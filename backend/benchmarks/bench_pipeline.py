@@ -0,0 +1,251 @@
+"""Stage-by-stage benchmark of the emotion pipeline in sentiment_model.py.
+
+    python benchmarks/bench_pipeline.py                        # JSON to stdout
+    python benchmarks/bench_pipeline.py --output run.json --threads 1 2 4
+    python benchmarks/bench_pipeline.py --skip-model           # no transformers needed
+
+Runs offline: the translator is replaced with FakeTranslator (identity
+translation, optional --translate-delay-ms to simulate the network).
+The model still has to be available in the local Hugging Face cache unless
+--skip-model is given.
+
+Times, over a fixed corpus of short, long, emoji-only and non-English
+texts:
+  clean_text, emoji      per text
+  translate              per text, cache cleared before every call
+  tokenize, forward      per batch, for every --batch-sizes and --threads
+  predict_single         predict_emotion_and_sentiment end to end
+  predict_batch          predict_emotions_batch end to end
+
+Every result row has stage, category, batch_size, threads, runs and
+timings in microseconds (mean, p50, p95, min, per_item) so runs can be
+diffed or plotted over time.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sentiment_model  # noqa: E402
+from translation import FakeTranslator  # noqa: E402
+
+CORPUS = {
+    "short": [
+        "I feel sad today",
+        "so happy right now",
+        "I'm scared of the exam",
+        "this is so annoying",
+        "okay",
+        "wow I did not expect that",
+    ],
+    "long": [
+        "I have been studying for three weeks straight for my final exams and I still feel like I don't understand "
+        "half of the material. Every time I open my notes I get a headache and my friends all seem to be doing fine, "
+        "which makes me feel even worse about myself. I barely sleep and I keep skipping meals because there is no time.",
+        "Today was honestly one of the best days I have had this semester. My group finally finished the project, the "
+        "lecturer said our presentation was the clearest one in the class, and afterwards we all went out for dinner "
+        "together. I didn't realise how much I needed a day like this after everything that happened last month.",
+        "My roommate keeps using my things without asking and leaves the kitchen in a mess every single night. I have "
+        "tried talking to them calmly twice already and nothing changed. I don't want to start a fight but I am "
+        "running out of patience and it is starting to affect how well I can focus on my assignments.",
+    ],
+    "emoji_only": ["😢", "😊😊", "😡", "😱😨", "🎉✨", "😐"],
+    "non_english": [
+        "saya rasa sangat sedih hari ini",
+        "saya gembira sangat dengan keputusan peperiksaan",
+        "aku takut nak jumpa pensyarah esok",
+        "geramnya dengan kawan sebilik saya",
+        "penat sangat belajar tak berhenti",
+        "tak sangka dapat biasiswa tu",
+    ],
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(stage, category, samples, items_per_run, batch_size=None, threads=None):
+    """samples: seconds per run."""
+    us = [s * 1e6 for s in samples]
+    mean = statistics.fmean(us)
+    return {
+        "stage": stage,
+        "category": category,
+        "batch_size": batch_size,
+        "threads": threads,
+        "runs": len(us),
+        "mean_us": round(mean, 2),
+        "p50_us": round(percentile(us, 0.5), 2),
+        "p95_us": round(percentile(us, 0.95), 2),
+        "min_us": round(min(us), 2),
+        "per_item_us": round(mean / items_per_run, 2),
+    }
+
+
+def time_runs(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def time_per_text(fn, texts, repeat):
+    """Time fn(text) for each text, repeat times; samples are per call."""
+    samples = []
+    for text in texts:
+        fn(text)  # warm-up
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(text)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def make_batch(texts, batch_size):
+    """batch_size texts, cycling through texts."""
+    return [texts[i % len(texts)] for i in range(batch_size)]
+
+
+def set_threads(threads):
+    """Set torch intra-op threads; returns False when torch isn't available."""
+    try:
+        import torch
+    except ImportError:
+        return False
+    torch.set_num_threads(threads)
+    return True
+
+
+def bench_text_stages(results, repeat):
+    translation_cache = sentiment_model._translation.cache
+
+    def translate_uncached(text):
+        translation_cache.clear()
+        sentiment_model.safe_translate(text)
+
+    for category, texts in CORPUS.items():
+        cleaned = [sentiment_model.clean_text(t) for t in texts]
+        results.append(summarize("clean_text", category, time_per_text(sentiment_model.clean_text, texts, repeat), 1))
+        results.append(summarize("emoji", category, time_per_text(sentiment_model.detect_emotion_from_emojis, cleaned, repeat), 1))
+        results.append(summarize("translate", category, time_per_text(translate_uncached, cleaned, repeat), 1))
+
+
+def bench_model_stages(results, repeat, batch_sizes, thread_counts):
+    sentiment_model.load_model()
+    tokenizer = sentiment_model.tokenizer
+    return_tensors = sentiment_model.backend.return_tensors
+    text_categories = [c for c in CORPUS if c != "emoji_only"]
+
+    for threads in thread_counts:
+        if not set_threads(threads):
+            threads = None
+        for category in text_categories:
+            for batch_size in batch_sizes:
+                batch = make_batch(CORPUS[category], batch_size)
+
+                def tokenize():
+                    return tokenizer(batch, return_tensors=return_tensors, truncation=True, padding=True)
+
+                inputs = tokenize()
+                results.append(summarize("tokenize", category, time_runs(tokenize, repeat), batch_size, batch_size, threads))
+                results.append(summarize(
+                    "forward", category, time_runs(lambda: sentiment_model._forward(inputs), repeat),
+                    batch_size, batch_size, threads
+                ))
+
+
+def bench_end_to_end(results, repeat, batch_sizes, thread_counts):
+    all_texts = [text for texts in CORPUS.values() for text in texts]
+
+    for threads in thread_counts:
+        if not set_threads(threads):
+            threads = None
+        for category, texts in CORPUS.items():
+            results.append(summarize(
+                "predict_single", category,
+                time_per_text(sentiment_model.predict_emotion_and_sentiment, texts, repeat),
+                1, 1, threads
+            ))
+        for batch_size in batch_sizes:
+            batch = make_batch(all_texts, batch_size)
+            results.append(summarize(
+                "predict_batch", "mixed",
+                time_runs(lambda: sentiment_model.predict_emotions_batch(batch, batch_size=batch_size), repeat),
+                batch_size, batch_size, threads
+            ))
+
+
+def environment():
+    info = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "backend": sentiment_model.INFERENCE_BACKEND,
+        "model": sentiment_model.MODEL_NAME,
+    }
+    try:
+        info["git_commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        info["git_commit"] = None
+    for module in ("torch", "transformers", "onnxruntime"):
+        try:
+            info[module] = __import__(module).__version__
+        except ImportError:
+            info[module] = None
+    return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per measurement")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--translate-delay-ms", type=float, default=0.0, help="simulated translator latency")
+    parser.add_argument("--skip-model", action="store_true", help="only the stages before tokenization")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    sentiment_model.set_translator(FakeTranslator(delay=args.translate_delay_ms / 1000))
+
+    thread_counts = sorted(set(args.threads))
+    results = []
+    bench_text_stages(results, args.repeat)
+    if not args.skip_model:
+        bench_model_stages(results, args.repeat, args.batch_sizes, thread_counts)
+        bench_end_to_end(results, args.repeat, args.batch_sizes, thread_counts)
+
+    report = {
+        "environment": environment(),
+        "config": vars(args),
+        "corpus_sizes": {category: len(texts) for category, texts in CORPUS.items()},
+        "results": results,
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"Wrote {len(results)} results to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
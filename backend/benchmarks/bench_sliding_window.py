@@ -0,0 +1,100 @@
+"""Batched vs sequential scoring of long texts split into windows.
+
+    python benchmarks/bench_sliding_window.py [--words 400 1200 3000] [--repeat 5] [--json]
+
+For each text length, compares:
+  truncated   one window (the old behaviour: everything past max length ignored)
+  sequential  every window tokenized and run through the model on its own
+  batched     all windows in one padded forward pass (what _score_batch does)
+
+The model has to be available in the local Hugging Face cache.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sentiment_model  # noqa: E402
+
+PARAGRAPH = (
+    "Today started fine but by the afternoon I was exhausted again. I keep telling myself that the exams will be "
+    "over soon and that I just need to push through, but every evening I sit at my desk and nothing goes in. "
+    "My friends invited me out and I said no because I felt guilty about not studying, and then I didn't study "
+    "anyway. I miss home and I miss feeling like I know what I'm doing. "
+)
+
+
+def long_text(words):
+    base = PARAGRAPH.split()
+    return " ".join(base[i % len(base)] for i in range(words))
+
+
+def timed(fn, repeat):
+    fn()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, nargs="+", default=[400, 1200, 3000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+
+    sentiment_model.load_model()
+    tokenizer = sentiment_model.tokenizer
+    return_tensors = sentiment_model.backend.return_tensors
+
+    def truncated(text):
+        inputs = tokenizer([text], return_tensors=return_tensors, truncation=True, padding=True)
+        return sentiment_model._forward(inputs)
+
+    def sequential(text):
+        features, owners, lengths = sentiment_model._tokenize_windows([text])
+        scores = []
+        for feature in features:
+            scores.extend(sentiment_model._forward(tokenizer.pad([feature], return_tensors=return_tensors)))
+        return sentiment_model._aggregate_windows(scores, owners, lengths, 1)
+
+    def batched(text):
+        return sentiment_model._score_batch([text])
+
+    rows = []
+    for words in args.words:
+        text = long_text(words)
+        windows = len(sentiment_model._tokenize_windows([text])[0])
+        row = {
+            "words": words,
+            "tokens": len(tokenizer(text)["input_ids"]),
+            "windows": windows,
+            "max_windows": sentiment_model.MAX_WINDOWS,
+            "truncated_ms": timed(lambda: truncated(text), args.repeat),
+            "sequential_ms": timed(lambda: sequential(text), args.repeat),
+            "batched_ms": timed(lambda: batched(text), args.repeat),
+        }
+        row["speedup"] = row["sequential_ms"] / row["batched_ms"] if row["batched_ms"] else None
+        rows.append(row)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{'words':>6} {'tokens':>7} {'windows':>8} {'truncated ms':>13} {'sequential ms':>14} {'batched ms':>11} {'speedup':>8}")
+    for row in rows:
+        print(
+            f"{row['words']:>6} {row['tokens']:>7} {row['windows']:>8} {row['truncated_ms']:>13.1f} "
+            f"{row['sequential_ms']:>14.1f} {row['batched_ms']:>11.1f} {row['speedup']:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import errors, pooling
+from flask import g
+
+logger = logging.getLogger(__name__)
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", "1234"),
+    "database": os.getenv("DB_NAME", "chatbot_db"),
+    "port": int(os.getenv("DB_PORT", "9900")),
+}
+
+# Pooled connections kept open (mysql-connector allows at most 32)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+# Extra short-lived connections allowed when the pool is exhausted
+DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "5"))
+# Seconds to wait for a free connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the checkout timeout."""
+
+
+class ConnectionPool:
+    """MySQLConnectionPool with overflow connections and a checkout timeout.
+
+    At most ``pool_size + max_overflow`` connections are checked out at once;
+    further callers wait up to ``timeout`` seconds. Connections from the
+    underlying pool are health-checked by mysql-connector on checkout (dead
+    ones are reconnected), so callers don't need to ping before queries.
+    """
+
+    def __init__(self, config, pool_size=10, max_overflow=5, timeout=5.0, name="mypool"):
+        self.config = config
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.name = name
+
+        self._slots = threading.BoundedSemaphore(pool_size + max_overflow)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._overflow = set()
+
+        self.checked_out = 0
+        self.overflow_in_use = 0
+        self.timeouts = 0
+
+    def _get_pool(self):
+        # Created on first use, so importing the app doesn't need a live server
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = pooling.MySQLConnectionPool(
+                        pool_name=self.name,
+                        pool_size=self.pool_size,
+                        pool_reset_session=True,
+                        autocommit=False,
+                        **self.config
+                    )
+        return self._pool
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        if not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise PoolTimeout(f"No database connection available after {timeout}s")
+
+        try:
+            try:
+                conn = self._get_pool().get_connection()
+                overflow = False
+            except errors.PoolError:
+                conn = mysql.connector.connect(autocommit=False, **self.config)
+                overflow = True
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.checked_out += 1
+            if overflow:
+                self._overflow.add(id(conn))
+                self.overflow_in_use += 1
+        return conn
+
+    def release(self, conn):
+        with self._lock:
+            self.checked_out -= 1
+            if id(conn) in self._overflow:
+                self._overflow.discard(id(conn))
+                self.overflow_in_use -= 1
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except mysql.connector.Error:
+            pass
+        try:
+            # Pooled: goes back to the pool. Overflow: really closes.
+            conn.close()
+        except mysql.connector.Error as err:
+            logger.warning("Error releasing connection: %s", err)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "checked_out": self.checked_out,
+                "overflow_in_use": self.overflow_in_use,
+                "checkout_timeouts": self.timeouts,
+            }
+
+
+pool = ConnectionPool(
+    DB_CONFIG,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_POOL_MAX_OVERFLOW,
+    timeout=DB_POOL_TIMEOUT,
+)
+
+
+@contextmanager
+def pooled_connection(timeout=None):
+    """Check a connection out of the pool for the duration of a ``with`` block."""
+    conn = pool.acquire(timeout)
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+def get_db():
+    """Connection for the current request, checked out on first use.
+
+    It is released back to the pool by close_db() when the request ends.
+    """
+    if "db_conn" not in g:
+        g.db_conn = pool.acquire()
+    return g.db_conn
+
+
+def close_db(exc=None):
+    conn = g.pop("db_conn", None)
+    if conn is not None:
+        pool.release(conn)
+
+
+def init_app(app):
+    app.teardown_appcontext(close_db)
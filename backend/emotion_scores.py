@@ -0,0 +1,93 @@
+"""Compact storage of the model's emotion score vectors.
+
+The 7 softmax scores (in sentiment_model.EMOTION_LABELS order) are stored
+as 7 unsigned bytes, score * 255 rounded, in the BINARY(7)
+``emotion_scores`` column of checkins and chat_logs. The quantization
+error is at most 0.002 per score, well below anything the insight code
+looks at. NULL means the label did not come from the model (emojis,
+errors, or rows written before the column existed).
+
+The request path reads only the rollup totals (see ROLLUP_COLUMNS);
+score_report.py decodes the raw rows in bulk for analysis and export.
+"""
+import numpy as np
+
+NUM_SCORES = 7
+SCALE = 255
+# A message whose top score is below this counts as "mixed"
+MIXED_THRESHOLD = 0.5
+
+
+def encode_scores(scores):
+    """7 floats in [0, 1] -> 7 bytes (None stays None)."""
+    if scores is None:
+        return None
+    values = np.asarray(scores, dtype=np.float64)
+    if values.shape != (NUM_SCORES,):
+        raise ValueError(f"expected {NUM_SCORES} scores, got shape {values.shape}")
+    return np.rint(np.clip(values, 0.0, 1.0) * SCALE).astype(np.uint8).tobytes()
+
+
+def decode_scores_bulk(blobs):
+    """Decode many stored values at once.
+
+    Returns (scores, valid): a float32 array of shape (n, 7) and a boolean
+    array of shape (n,). Rows for NULL / malformed values are all zeros
+    and marked False in ``valid``.
+    """
+    valid = np.fromiter((b is not None and len(b) == NUM_SCORES for b in blobs), dtype=bool, count=len(blobs))
+    scores = np.zeros((len(blobs), NUM_SCORES), dtype=np.float32)
+    if valid.any():
+        packed = b"".join(bytes(b) for b, ok in zip(blobs, valid) if ok)
+        scores[valid] = np.frombuffer(packed, dtype=np.uint8).reshape(-1, NUM_SCORES) / np.float32(SCALE)
+    return scores, valid
+
+
+def summarize_scores(scores, labels, mixed_threshold=MIXED_THRESHOLD):
+    """Mean distribution, mean confidence and share of mixed messages.
+
+    ``scores`` is an (n, 7) array of valid rows. A message is "mixed" when
+    its top score is below ``mixed_threshold``.
+    """
+    if len(scores) == 0:
+        return {"scored": 0, "mean_scores": None, "mean_confidence": None, "mixed_share": None}
+    top = scores.max(axis=1)
+    return {
+        "scored": int(len(scores)),
+        "mean_scores": {label: round(float(v), 3) for label, v in zip(labels, scores.mean(axis=0))},
+        "mean_confidence": round(float(top.mean()), 3),
+        "mixed_share": round(float((top < mixed_threshold).mean()), 3),
+    }
+
+
+# checkin_daily_rollups keeps running integer totals of the stored bytes so
+# the dashboard can show means without reading the raw check-ins:
+#   scored_count   check-ins that have scores
+#   score_top_sum  sum of each check-in's top score
+#   mixed_count    check-ins whose top score is below MIXED_THRESHOLD
+#   score_sum_0-6  per-emotion sums
+ROLLUP_COLUMNS = ["scored_count", "score_top_sum", "mixed_count"] + [f"score_sum_{i}" for i in range(NUM_SCORES)]
+
+
+def rollup_increment(blob):
+    """Rollup totals contributed by one stored value (all zeros for NULL)."""
+    if blob is None or len(blob) != NUM_SCORES:
+        return (0,) * len(ROLLUP_COLUMNS)
+    values = bytes(blob)
+    top = max(values)
+    return (1, top, int(top < MIXED_THRESHOLD * SCALE)) + tuple(values)
+
+
+def summarize_rollup(totals, labels):
+    """summarize_scores() output computed from summed ROLLUP_COLUMNS values."""
+    scored, top_sum, mixed = (int(v or 0) for v in totals[:3])
+    if not scored:
+        return {"scored": 0, "mean_scores": None, "mean_confidence": None, "mixed_share": None}
+    return {
+        "scored": scored,
+        "mean_scores": {
+            label: round(int(v or 0) / (scored * SCALE), 3) for label, v in zip(labels, totals[3:])
+        },
+        "mean_confidence": round(top_sum / (scored * SCALE), 3),
+        "mixed_share": round(mixed / scored, 3),
+    }
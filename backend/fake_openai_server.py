@@ -0,0 +1,171 @@
+"""Local OpenAI-compatible chat completions server for offline testing.
+
+    python fake_openai_server.py --port 8089 --latency-ms 300 --error-rate 0.1
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake python app.py
+
+Serves POST /v1/chat/completions, both plain and streaming (stream=true,
+Server-Sent Events), with configurable latency, per-chunk delay and a
+random error rate, so timeouts, retries and the concurrency cap can be
+exercised without the real API. GET /stats returns request counters.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = (
+    "I'm really sorry you're feeling this way. It sounds like a lot to carry right now.\n\n"
+    "What do you think would help you most today?"
+)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Set by make_server()
+    options = None
+    counters = None
+    lock = None
+
+    def log_message(self, format, *args):
+        if self.options.verbose:
+            super().log_message(format, *args)
+
+    def _count(self, key):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self.lock:
+                self._send_json(200, dict(self.counters))
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON", "type": "invalid_request_error"}})
+            return
+        if self.path.rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        self._count("requests")
+        options = self.options
+        time.sleep(max(0.0, random.gauss(options.latency_ms, options.jitter_ms)) / 1000)
+
+        if random.random() < options.error_rate:
+            self._count("errors")
+            headers = {"Retry-After": str(options.retry_after)} if options.error_status == 429 else None
+            self._send_json(
+                options.error_status,
+                {"error": {"message": "Injected failure", "type": "server_error", "code": None}},
+                headers,
+            )
+            return
+
+        model = request.get("model", "gpt-4o-mini")
+        reply = options.reply
+        if request.get("stream"):
+            self._count("streams")
+            self._stream(model, reply)
+        else:
+            self._count("completions")
+            self._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(reply.split()), "total_tokens": len(reply.split())},
+            })
+
+    def _stream(self, model, reply):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        # No Content-Length: the end of the stream is the end of the connection
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        def chunk(delta, finish_reason=None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+            self.wfile.flush()
+
+        try:
+            chunk({"role": "assistant", "content": ""})
+            for word in reply.split(" "):
+                time.sleep(self.options.chunk_delay_ms / 1000)
+                chunk({"content": word + " "})
+            chunk({}, finish_reason="stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self._count("client_disconnects")
+
+
+def make_server(host, port, options):
+    handler = type("Handler", (FakeOpenAIHandler,), {
+        "options": options,
+        "counters": {},
+        "lock": threading.Lock(),
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=200, help="mean delay before the response starts")
+    parser.add_argument("--jitter-ms", type=float, default=50, help="standard deviation of that delay")
+    parser.add_argument("--chunk-delay-ms", type=float, default=20, help="delay between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected failures")
+    parser.add_argument("--retry-after", type=float, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--reply", default=DEFAULT_REPLY)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    options = parser.parse_args()
+
+    server = make_server(options.host, options.port, options)
+    print(f"Fake OpenAI server on http://{options.host}:{options.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Inference backends for the emotion model.
+
+    torch      eager PyTorch (default)
+    onnx       ONNX Runtime on the exported fp32 model
+    onnx-int8  ONNX Runtime on the dynamically int8-quantized export
+
+Every backend has ``return_tensors`` (what the tokenizer should produce for
+it) and ``logits(inputs)`` returning a NumPy array of shape (batch, 7).
+
+Export the ONNX files and check them against PyTorch with:
+
+    python inference_backends.py export
+    python inference_backends.py parity --backend onnx-int8
+"""
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKEND_NAMES = ("torch", "onnx", "onnx-int8")
+
+ONNX_DIR = os.getenv("EMOTION_ONNX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx_model"))
+ONNX_FP32_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+
+# 0 = let the runtime decide
+INTRA_OP_THREADS = int(os.getenv("EMOTION_INTRA_OP_THREADS", "0"))
+INTER_OP_THREADS = int(os.getenv("EMOTION_INTER_OP_THREADS", "0"))
+
+# Fixed inputs for the parity check
+PARITY_TEXTS = [
+    "ok",
+    "yes",
+    "I feel really tired today and it makes me so sad",
+    "I'm so stressed about my exams next week, I keep overthinking everything",
+    "I finally passed my assignment, I'm so happy!",
+    "Why does everyone keep ignoring me? This is so unfair.",
+    "That smell in the lab was disgusting",
+    "I'm scared I will fail this semester",
+    "Wow, I did not expect to get the scholarship!",
+    "I went to class and then had lunch.",
+    "Sometimes I don't know if I'm doing the right course. My friends all seem to have it figured out and I just feel lost, like I'm wasting my parents' money and my own time.",
+    "",
+]
+
+
+def softmax(logits):
+    logits = np.asarray(logits, dtype=np.float32)
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class TorchBackend:
+    name = "torch"
+    return_tensors = "pt"
+
+    def __init__(self, model_name, intra_op_threads=0, inter_op_threads=0):
+        import torch
+        from transformers import AutoModelForSequenceClassification
+
+        if intra_op_threads:
+            torch.set_num_threads(intra_op_threads)
+        if inter_op_threads:
+            try:
+                torch.set_num_interop_threads(inter_op_threads)
+            except RuntimeError as e:
+                # Can only be set once, before any inter-op parallel work
+                logger.warning("Could not set torch inter-op threads: %s", e)
+
+        self._torch = torch
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        self.model.eval()
+
+    def logits(self, inputs):
+        with self._torch.no_grad():
+            return self.model(**inputs).logits.numpy()
+
+
+class OnnxBackend:
+    return_tensors = "np"
+
+    def __init__(self, model_path, name="onnx", intra_op_threads=0, inter_op_threads=0):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("onnxruntime is not installed: pip install onnxruntime")
+        if not os.path.exists(model_path):
+            raise RuntimeError(f"{model_path} not found, run: python inference_backends.py export")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.name = name
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def logits(self, inputs):
+        feed = {key: np.asarray(inputs[key], dtype=np.int64) for key in self.input_names}
+        return self.session.run(["logits"], feed)[0]
+
+
+def create_backend(name, model_name, onnx_dir=ONNX_DIR,
+                   intra_op_threads=INTRA_OP_THREADS, inter_op_threads=INTER_OP_THREADS):
+    if name == "torch":
+        return TorchBackend(model_name, intra_op_threads, inter_op_threads)
+    if name == "onnx":
+        return OnnxBackend(os.path.join(onnx_dir, ONNX_FP32_FILE), "onnx", intra_op_threads, inter_op_threads)
+    if name == "onnx-int8":
+        return OnnxBackend(os.path.join(onnx_dir, ONNX_INT8_FILE), "onnx-int8", intra_op_threads, inter_op_threads)
+    raise ValueError(f"Unknown inference backend '{name}', expected one of {BACKEND_NAMES}")
+
+
+def export_onnx(model_name, onnx_dir=ONNX_DIR, quantize=True, opset=14):
+    """Export the PyTorch model to ONNX, plus a dynamically int8-quantized copy."""
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    os.makedirs(onnx_dir, exist_ok=True)
+    fp32_path = os.path.join(onnx_dir, ONNX_FP32_FILE)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+    model.config.return_dict = False
+
+    sample = tokenizer(PARITY_TEXTS[:2], return_tensors="pt", padding=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=opset,
+        )
+    print(f"Exported {fp32_path}")
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        int8_path = os.path.join(onnx_dir, ONNX_INT8_FILE)
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"Exported {int8_path}")
+
+
+def parity_check(tokenizer, reference, candidate, texts=PARITY_TEXTS, max_prob_diff=0.02,
+                 min_argmax_agreement=1.0):
+    """Compare a candidate backend against the reference (PyTorch) on ``texts``.
+
+    Passes when the largest softmax difference is within ``max_prob_diff``
+    and the predicted labels agree on at least ``min_argmax_agreement`` of
+    the texts. Also reports the time per forward pass of each backend.
+    """
+    def run(backend):
+        inputs = tokenizer(texts, return_tensors=backend.return_tensors, truncation=True, padding=True)
+        backend.logits(inputs)  # warm-up
+        start = time.perf_counter()
+        logits = backend.logits(inputs)
+        return np.asarray(logits, dtype=np.float32), (time.perf_counter() - start) * 1000.0
+
+    ref_logits, ref_ms = run(reference)
+    cand_logits, cand_ms = run(candidate)
+
+    ref_probs = softmax(ref_logits)
+    cand_probs = softmax(cand_logits)
+    agreement = float(np.mean(ref_probs.argmax(axis=1) == cand_probs.argmax(axis=1)))
+    prob_diff = float(np.abs(ref_probs - cand_probs).max())
+
+    return {
+        "texts": len(texts),
+        "max_abs_logit_diff": float(np.abs(ref_logits - cand_logits).max()),
+        "max_prob_diff": prob_diff,
+        "argmax_agreement": agreement,
+        "reference_ms": ref_ms,
+        "candidate_ms": cand_ms,
+        "speedup": (ref_ms / cand_ms) if cand_ms else None,
+        "passed": prob_diff <= max_prob_diff and agreement >= min_argmax_agreement,
+    }
+
+
+def main():
+    from sentiment_model import MODEL_NAME
+
+    parser = argparse.ArgumentParser(description="Emotion model inference backends")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = sub.add_parser("export", help="export ONNX (and int8) models")
+    export_parser.add_argument("--onnx-dir", default=ONNX_DIR)
+    export_parser.add_argument("--no-quantize", action="store_true")
+
+    parity_parser = sub.add_parser("parity", help="compare a backend against PyTorch")
+    parity_parser.add_argument("--backend", default="onnx-int8", choices=BACKEND_NAMES)
+    parity_parser.add_argument("--onnx-dir", default=ONNX_DIR)
+    parity_parser.add_argument("--max-prob-diff", type=float, default=None)
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(MODEL_NAME, args.onnx_dir, quantize=not args.no_quantize)
+        return
+
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    reference = create_backend("torch", MODEL_NAME)
+    candidate = create_backend(args.backend, MODEL_NAME, onnx_dir=args.onnx_dir)
+
+    # int8 weights move the scores a bit more than an fp32 export does
+    max_prob_diff = args.max_prob_diff
+    if max_prob_diff is None:
+        max_prob_diff = 0.1 if args.backend == "onnx-int8" else 0.001
+    min_agreement = 0.9 if args.backend == "onnx-int8" else 1.0
+
+    result = parity_check(tokenizer, reference, candidate, max_prob_diff=max_prob_diff,
+                          min_argmax_agreement=min_agreement)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    raise SystemExit(0 if result["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""OpenAI chat client with timeouts, a concurrency cap and retries.
+
+Every LLM call in the app goes through one LLMClient so that a slow or
+failing provider can't tie up all Flask worker threads:
+
+  * one pooled httpx client (keep-alive connections are reused)
+  * connect / read timeouts on every call
+  * at most ``max_concurrency`` calls in flight; callers wait up to
+    ``queue_timeout`` seconds for a slot, then get LLMBusy
+  * retryable errors (connection errors, timeouts, 408/409/429/5xx) are
+    retried with full-jitter exponential backoff, honouring Retry-After
+
+OPENAI_BASE_URL points the client at any OpenAI-compatible server, e.g.
+fake_openai_server.py for offline testing.
+"""
+import logging
+import os
+import random
+import threading
+import time
+
+import httpx
+import openai
+from openai import OpenAI
+
+from metrics import LLM_CALL_SECONDS, ERRORS
+
+logger = logging.getLogger(__name__)
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+# Seconds for the whole response (non-streaming) or between chunks (streaming)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+# Calls in flight at once, and how long a caller waits for a free slot
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "10"))
+# Retries after the first attempt, and the backoff bounds in seconds
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "8"))
+
+RETRYABLE_STATUS = (408, 409, 429)
+
+
+class LLMBusy(Exception):
+    """No LLM call slot became free within the queue timeout."""
+
+
+def is_retryable(error):
+    if isinstance(error, openai.APIConnectionError):  # includes APITimeoutError
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    return False
+
+
+def retry_after_seconds(error):
+    """Retry-After header of an error response, in seconds (None if absent)."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMClient:
+    def __init__(self, api_key=None, base_url=OPENAI_BASE_URL, model=LLM_MODEL,
+                 timeout=LLM_TIMEOUT, connect_timeout=LLM_CONNECT_TIMEOUT,
+                 max_concurrency=LLM_MAX_CONCURRENCY, queue_timeout=LLM_QUEUE_TIMEOUT,
+                 max_retries=LLM_MAX_RETRIES, backoff_base=LLM_BACKOFF_BASE, backoff_max=LLM_BACKOFF_MAX):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.http_client = httpx.Client(
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+        # Retries are done here (with the concurrency slot released while waiting)
+        self.client = OpenAI(api_key=api_key, base_url=base_url, http_client=self.http_client, max_retries=0)
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+
+        # Stats
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.busy = 0
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.busy += 1
+            raise LLMBusy(f"No LLM slot free after {self.queue_timeout}s ({self.max_concurrency} calls in flight)")
+        with self._lock:
+            self.in_flight += 1
+            self.calls += 1
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _backoff(self, attempt, error):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        with self._lock:
+            self.retries += 1
+        logger.warning("LLM call failed (%s), retry %d in %.2fs", error, attempt + 1, delay)
+        time.sleep(delay)
+
+    def _failed(self, error):
+        with self._lock:
+            self.failures += 1
+        ERRORS.inc(component="llm")
+        logger.error("LLM call failed: %s", error)
+
+    def complete(self, messages, model=None, call="chat", **kwargs):
+        """Chat completion (non-streaming). Returns the ChatCompletion object.
+
+        ``call`` names the call site in the llm_call_seconds metric.
+        """
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = self._complete(messages, model, **kwargs)
+            outcome = "ok"
+            return response
+        except LLMBusy:
+            outcome = "busy"
+            raise
+        finally:
+            LLM_CALL_SECONDS.observe(time.perf_counter() - start, call=call, outcome=outcome)
+
+    def _complete(self, messages, model, **kwargs):
+        attempt = 0
+        while True:
+            self._acquire()
+            try:
+                return self.client.chat.completions.create(model=model or self.model, messages=messages, **kwargs)
+            except Exception as e:
+                error = e
+            finally:
+                self._release()
+
+            if attempt >= self.max_retries or not is_retryable(error):
+                self._failed(error)
+                raise error
+            self._backoff(attempt, error)
+            attempt += 1
+
+    def stream(self, messages, model=None, call="chat_stream", **kwargs):
+        """Streaming chat completion, yields the reply text piece by piece.
+
+        The slot is held until the stream is finished or closed. A failure is
+        retried only while nothing has been yielded yet.
+        """
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            yield from self._stream(messages, model, **kwargs)
+            outcome = "ok"
+        except LLMBusy:
+            outcome = "busy"
+            raise
+        except GeneratorExit:
+            outcome = "cancelled"
+            raise
+        finally:
+            LLM_CALL_SECONDS.observe(time.perf_counter() - start, call=call, outcome=outcome)
+
+    def _stream(self, messages, model, **kwargs):
+        attempt = 0
+        while True:
+            yielded = False
+            self._acquire()
+            try:
+                stream = self.client.chat.completions.create(
+                    model=model or self.model, messages=messages, stream=True, **kwargs
+                )
+                try:
+                    for chunk in stream:
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            yielded = True
+                            yield delta
+                finally:
+                    stream.close()
+                return
+            except Exception as e:
+                error = e
+            finally:
+                self._release()
+
+            if yielded or attempt >= self.max_retries or not is_retryable(error):
+                self._failed(error)
+                raise error
+            self._backoff(attempt, error)
+            attempt += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "model": self.model,
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "calls": self.calls,
+                "retries": self.retries,
+                "failures": self.failures,
+                "busy_rejections": self.busy,
+            }
@@ -0,0 +1,210 @@
+"""In-process metrics rendered in the Prometheus text format.
+
+    with STAGE_SECONDS.time(stage="forward"):
+        ...
+    EMOJI_SHORT_CIRCUITS.inc()
+
+Counters and histograms are thread-safe and cost a lock and a few list
+operations per update. render() returns the text served on /metrics;
+render_stats() turns the existing stats() dicts (pool, batcher, caches,
+...) into gauges at scrape time.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers sub-millisecond emoji checks up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        # Name on the HELP / TYPE lines
+        self.family = name
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.family} {self.help}", f"# TYPE {self.family} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_items(items))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self.family = name + "_total"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _render_items(self, items):
+        for key, value in items:
+            yield f"{self.family}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # [per-bucket counts, sum, count]
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a ``with`` block (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_items(self, items):
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self.register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def render_stats(prefix, stats):
+    """Gauge lines for the numeric values of a stats() dict.
+
+    Nested dicts become ``prefix_key_subkey``; dicts keyed by numbers (e.g.
+    a batch size histogram) become one series per key with a ``key`` label.
+    Strings and None are skipped.
+    """
+    lines = []
+
+    def walk(name, value):
+        if isinstance(value, (bool, int, float)):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_format_value(float(value))}")
+        elif isinstance(value, dict):
+            if value and all(not isinstance(k, str) or k.isdigit() for k in value):
+                lines.append(f"# TYPE {name} gauge")
+                for k in sorted(value, key=int):
+                    lines.append(f"{name}{_format_labels(['key'], [k])} {_format_value(float(value[k]))}")
+            else:
+                for k, v in value.items():
+                    walk(f"{name}_{k}", v)
+
+    walk(prefix, stats)
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+REGISTRY = Registry()
+
+# Emotion pipeline
+STAGE_SECONDS = REGISTRY.histogram(
+    "emotion_stage_seconds", "Time spent in each emotion pipeline stage (translate, tokenize, pad, forward)", ["stage"]
+)
+EMOJI_SHORT_CIRCUITS = REGISTRY.counter(
+    "emotion_emoji_short_circuits", "Messages whose emotion came from emojis without running the model"
+)
+TRANSLATION_FALLBACKS = REGISTRY.counter(
+    "translation_fallbacks", "Translations that fell back to the original text", ["reason"]
+)
+
+# Database and LLM
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "db_query_seconds", "Time spent in a group of related database queries", ["group"]
+)
+LLM_CALL_SECONDS = REGISTRY.histogram(
+    "llm_call_seconds", "Duration of LLM calls including retries (streams: until the last token)",
+    ["call", "outcome"]
+)
+
+# HTTP
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_seconds", "Route latency until the response starts", ["route", "method", "status"]
+)
+
+ERRORS = REGISTRY.counter("errors", "Errors by component", ["component"])
+
+
+def render():
+    return REGISTRY.render()
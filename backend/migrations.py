@@ -0,0 +1,330 @@
+"""Versioned schema migrations for the chatbot database.
+
+    python migrations.py status     # applied / pending versions
+    python migrations.py upgrade    # apply pending migrations in order
+    python migrations.py check      # EXPLAIN the hot queries, exit 1 on a full scan
+
+Applied versions are recorded in the schema_migrations table. Every step is
+written so it also works on databases that were set up by hand with the
+older scripts in sql/ (tables and indexes that already exist are skipped).
+"""
+import argparse
+import sys
+
+import mysql.connector
+from dotenv import load_dotenv
+
+# Same .env as the app, read before db builds DB_CONFIG from the environment
+load_dotenv()
+
+from db import DB_CONFIG  # noqa: E402
+from emotion_scores import MIXED_THRESHOLD, NUM_SCORES, ROLLUP_COLUMNS, SCALE  # noqa: E402
+import queries  # noqa: E402
+
+
+def table_indexes(cursor, table):
+    """{index name: (columns in order, unique)} for every index of a table."""
+    cursor.execute(
+        "SELECT index_name, column_name, non_unique FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s ORDER BY index_name, seq_in_index",
+        (table,)
+    )
+    indexes = {}
+    for name, column, non_unique in cursor.fetchall():
+        columns, _ = indexes.get(name, ([], None))
+        indexes[name] = (columns + [column.lower()], not non_unique)
+    return indexes
+
+
+def drop_redundant_indexes(cursor, table, index_name, columns):
+    """Drop non-unique indexes whose columns are a leading part of ``columns``.
+
+    ``index_name`` (on ``columns``) serves every query they could, so they
+    only cost writes (e.g. idx_conversations_user from sql/add_conversations.sql).
+    """
+    columns = [c.lower() for c in columns]
+    for name, (index_columns, unique) in table_indexes(cursor, table).items():
+        if name in (index_name, "PRIMARY") or unique:
+            continue
+        if index_columns == columns[:len(index_columns)]:
+            cursor.execute(f"DROP INDEX {name} ON {table}")
+
+
+def ensure_index(cursor, table, index_name, columns, unique=False):
+    """Create an index unless one with this name, or one starting with the same
+    columns (and unique if required), already exists. Older indexes the new one
+    makes redundant are dropped."""
+    wanted = [c.lower() for c in columns]
+    for name, (index_columns, index_unique) in table_indexes(cursor, table).items():
+        if name == index_name or (index_columns[:len(wanted)] == wanted and (index_unique or not unique)):
+            return
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    cursor.execute(f"CREATE {kind} {index_name} ON {table} ({', '.join(columns)})")
+    drop_redundant_indexes(cursor, table, index_name, columns)
+
+
+def column_exists(cursor, table, column):
+    cursor.execute(
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s LIMIT 1",
+        (table, column)
+    )
+    return cursor.fetchone() is not None
+
+
+def ensure_column(cursor, table, column, definition):
+    if column_exists(cursor, table, column):
+        return
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _m001_base_tables(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+          id INT AUTO_INCREMENT PRIMARY KEY,
+          name VARCHAR(255) NOT NULL,
+          email VARCHAR(255) NOT NULL,
+          password_hash VARCHAR(255) NULL,
+          course VARCHAR(255) NULL,
+          gender VARCHAR(50) NULL,
+          date_of_birth DATE NULL,
+          education_level VARCHAR(100) NULL,
+          race VARCHAR(100) NULL,
+          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS conversations (
+          id INT AUTO_INCREMENT PRIMARY KEY,
+          user_id INT NOT NULL,
+          title VARCHAR(255) DEFAULT 'New Chat',
+          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+          updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+          FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chat_logs (
+          id INT AUTO_INCREMENT PRIMARY KEY,
+          user_id INT NOT NULL,
+          message_type ENUM('user', 'bot') NOT NULL,
+          content TEXT NOT NULL,
+          emotion VARCHAR(50),
+          sentiment VARCHAR(50),
+          timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+          conversation_id INT NULL,
+          FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS checkins (
+          id INT AUTO_INCREMENT PRIMARY KEY,
+          user_id INT NOT NULL,
+          date DATE NOT NULL,
+          time TIME NOT NULL,
+          emotion VARCHAR(50) NOT NULL,
+          sentiment VARCHAR(50) NOT NULL,
+          emoji VARCHAR(10),
+          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+          FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+
+
+def _m002_checkin_rollups(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS checkin_daily_rollups (
+          user_id INT NOT NULL,
+          day DATE NOT NULL,
+          emotion VARCHAR(50) NOT NULL,
+          sentiment VARCHAR(50) NOT NULL,
+          count INT NOT NULL DEFAULT 0,
+          PRIMARY KEY (user_id, day, emotion, sentiment),
+          FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+    # Backfill only if the table is new/empty, so re-running never double counts
+    cursor.execute("SELECT 1 FROM checkin_daily_rollups LIMIT 1")
+    if cursor.fetchone() is None:
+        cursor.execute("""
+            INSERT INTO checkin_daily_rollups (user_id, day, emotion, sentiment, count)
+            SELECT user_id, date, emotion, sentiment, COUNT(*)
+            FROM checkins
+            GROUP BY user_id, date, emotion, sentiment
+        """)
+
+
+# Indexes added for the hot queries: (table, name, columns, unique)
+HOT_QUERY_INDEXES = [
+    # Login / register / profile email checks
+    ("users", "uq_users_email", ["email"], True),
+    # Chat history (user + conversation, newest first) and per-conversation pages
+    ("chat_logs", "idx_chat_logs_user_conv_ts", ["user_id", "conversation_id", "timestamp", "id"], False),
+    # All logs of a user in time order
+    ("chat_logs", "idx_chat_logs_user_ts", ["user_id", "timestamp", "id"], False),
+    # Check-in list, newest first
+    ("checkins", "idx_checkins_user_date_time", ["user_id", "date", "time", "id"], False),
+    # Conversation list, most recently updated first
+    ("conversations", "idx_conversations_user_updated", ["user_id", "updated_at", "id"], False),
+]
+
+
+def _m003_hot_query_indexes(cursor):
+    for table, index_name, columns, unique in HOT_QUERY_INDEXES:
+        ensure_index(cursor, table, index_name, columns, unique=unique)
+
+
+def _m004_emotion_scores(cursor):
+    # The model's 7 scores quantized to one byte each (see emotion_scores.py),
+    # NULL when the label came from emojis or for rows scored before this
+    ensure_column(cursor, "checkins", "emotion_scores", "BINARY(7) NULL")
+    ensure_column(cursor, "chat_logs", "emotion_scores", "BINARY(7) NULL")
+
+
+def _m005_rollup_score_totals(cursor):
+    # Running totals of the stored score bytes per rollup row (see
+    # emotion_scores.ROLLUP_COLUMNS), so means don't need the raw check-ins
+    for column in ROLLUP_COLUMNS:
+        ensure_column(cursor, "checkin_daily_rollups", column, "INT NOT NULL DEFAULT 0")
+
+    top = "GREATEST(" + ", ".join(f"ASCII(SUBSTRING(emotion_scores, {i + 1}, 1))" for i in range(NUM_SCORES)) + ")"
+    sums = [f"SUM(ASCII(SUBSTRING(emotion_scores, {i + 1}, 1)))" for i in range(NUM_SCORES)]
+    # Backfill from the check-ins scored since migration 4; only rows still
+    # at zero, so re-running never double counts
+    cursor.execute(f"""
+        UPDATE checkin_daily_rollups r
+        JOIN (
+            SELECT user_id, date, emotion, sentiment,
+                   COUNT(*) AS n, SUM({top}) AS top_sum, SUM({top} < {MIXED_THRESHOLD * SCALE}) AS mixed,
+                   {", ".join(f"{expr} AS s{i}" for i, expr in enumerate(sums))}
+            FROM checkins
+            WHERE emotion_scores IS NOT NULL
+            GROUP BY user_id, date, emotion, sentiment
+        ) c ON c.user_id = r.user_id AND c.date = r.day AND c.emotion = r.emotion AND c.sentiment = r.sentiment
+        SET r.scored_count = c.n, r.score_top_sum = c.top_sum, r.mixed_count = c.mixed,
+            {", ".join(f"r.score_sum_{i} = c.s{i}" for i in range(NUM_SCORES))}
+        WHERE r.scored_count = 0
+    """)
+
+
+def _m006_drop_redundant_indexes(cursor):
+    # Databases that ran version 3 before ensure_index dropped the indexes it
+    # makes redundant (e.g. idx_conversations_user from sql/add_conversations.sql)
+    for table, index_name, columns, unique in HOT_QUERY_INDEXES:
+        if index_name in table_indexes(cursor, table):
+            drop_redundant_indexes(cursor, table, index_name, columns)
+
+
+# (version, name, function) in the order they must run. Never edit or reorder
+# an entry that has shipped; add a new version instead.
+MIGRATIONS = [
+    (1, "base tables", _m001_base_tables),
+    (2, "checkin daily rollups", _m002_checkin_rollups),
+    (3, "hot query indexes", _m003_hot_query_indexes),
+    (4, "emotion score vectors", _m004_emotion_scores),
+    (5, "rollup score totals", _m005_rollup_score_totals),
+    (6, "drop redundant indexes", _m006_drop_redundant_indexes),
+]
+
+
+# Queries run on (nearly) every request, with sample parameters for EXPLAIN
+HOT_QUERIES = [
+    ("login by email", queries.LOGIN_BY_EMAIL, ("someone@example.com",)),
+    # Limit: the CHAT_HISTORY_MAX_ROWS default
+    ("chat history", queries.CHAT_HISTORY, (1, 1, 40)),
+    # Limit: PAGE_DEFAULT_LIMIT + 1, what a page fetches
+    ("conversation logs page", queries.CONVERSATION_LOGS_PAGE_AFTER,
+     (1, 1, "2024-01-01 00:00:00", "2024-01-01 00:00:00", 0, 51)),
+    ("chat logs page", queries.CHAT_LOGS_PAGE_AFTER, (1, "2024-01-01 00:00:00", "2024-01-01 00:00:00", 0, 51)),
+    ("checkins list", queries.CHECKINS_LIST, (1,)),
+    ("checkins page", queries.CHECKINS_PAGE_AFTER, (1, "2024-01-01", "2024-01-01", "12:00:00", "12:00:00", 0, 51)),
+    ("conversations list", queries.CONVERSATIONS_LIST, (1,)),
+    ("conversations page", queries.CONVERSATIONS_PAGE_AFTER, (1, "2024-01-01 00:00:00", "2024-01-01 00:00:00", 0, 51)),
+    ("insight rollups", queries.INSIGHT_ROLLUPS, (1, "2024-01-01")),
+]
+
+# EXPLAIN access types that mean "read the whole table / whole index"
+FULL_SCAN_TYPES = ("ALL", "index")
+
+
+def ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+          version INT PRIMARY KEY,
+          name VARCHAR(255) NOT NULL,
+          applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(cursor):
+    ensure_migrations_table(cursor)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def upgrade(conn):
+    """Apply all pending migrations in version order. Returns the versions applied."""
+    cursor = conn.cursor(buffered=True)
+    done = applied_versions(cursor)
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version in done:
+            continue
+        print(f"Applying migration {version}: {name}")
+        migrate(cursor)
+        cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+        conn.commit()
+        applied.append(version)
+    cursor.close()
+    return applied
+
+
+def check_hot_queries(conn):
+    """EXPLAIN every hot query; return a list of problems (empty means all use an index)."""
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    problems = []
+    for name, sql, params in HOT_QUERIES:
+        cursor.execute("EXPLAIN " + sql, params)
+        for row in cursor.fetchall():
+            if not row.get("table"):
+                continue
+            if row.get("type") in FULL_SCAN_TYPES or row.get("key") is None:
+                problems.append(
+                    f"{name}: full scan on {row['table']} (type={row.get('type')}, key={row.get('key')})"
+                )
+    cursor.close()
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chatbot database migrations")
+    parser.add_argument("command", choices=["status", "upgrade", "check"])
+    args = parser.parse_args()
+
+    conn = mysql.connector.connect(autocommit=False, **DB_CONFIG)
+    try:
+        if args.command == "status":
+            cursor = conn.cursor(buffered=True)
+            done = applied_versions(cursor)
+            cursor.close()
+            for version, name, _ in MIGRATIONS:
+                print(f"{version:>4}  {'applied' if version in done else 'pending':8} {name}")
+
+        elif args.command == "upgrade":
+            applied = upgrade(conn)
+            print(f"Applied {len(applied)} migration(s)" if applied else "Database is up to date")
+
+        elif args.command == "check":
+            problems = check_hot_queries(conn)
+            for problem in problems:
+                print(problem)
+            if problems:
+                sys.exit(1)
+            print(f"All {len(HOT_QUERIES)} hot queries use an index")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Writes for finished chat turns.
+
+A turn is a dict with:
+    user_id, conversation_id, user_message, bot_reply, emotion, sentiment,
+    emoji (or None), date ("YYYY-MM-DD"), time ("HH:MM:SS"),
+    emotion_scores (7 bytes from emotion_scores.encode_scores, or None),
+    new_title (or None to keep the current conversation title)
+
+persist_chat_turns() writes any number of turns with one statement per
+table and a single commit, so it serves both a single /api/chat turn and
+batches of turns.
+"""
+import datetime
+
+from emotion_scores import ROLLUP_COLUMNS, encode_scores, rollup_increment
+from metrics import DB_QUERY_SECONDS
+
+# checkins.emoji is VARCHAR(10)
+EMOJI_MAX_LENGTH = 10
+
+_ROLLUP_VALUE_COLUMNS = ["count"] + ROLLUP_COLUMNS
+ROLLUP_UPSERT = (
+    f"INSERT INTO checkin_daily_rollups (user_id, day, emotion, sentiment, {', '.join(_ROLLUP_VALUE_COLUMNS)}) "
+    f"VALUES ({', '.join(['%s'] * (4 + len(_ROLLUP_VALUE_COLUMNS)))}) "
+    f"ON DUPLICATE KEY UPDATE {', '.join(f'{c} = {c} + VALUES({c})' for c in _ROLLUP_VALUE_COLUMNS)}"
+)
+
+
+def make_chat_turn(user_id, conversation_id, user_message, bot_reply, emotion, sentiment,
+                   emoji=None, new_title=None, now=None, scores=None):
+    now = now or datetime.datetime.now()
+    # The emoji comes from the client; anything that isn't a short string
+    # would fail the whole INSERT (and, write-behind, its batch)
+    if not isinstance(emoji, str) or not emoji:
+        emoji = None
+    else:
+        emoji = emoji[:EMOJI_MAX_LENGTH]
+    return {
+        "user_id": user_id,
+        "conversation_id": conversation_id,
+        "user_message": user_message,
+        "bot_reply": bot_reply,
+        "emotion": emotion,
+        "sentiment": sentiment,
+        "emoji": emoji,
+        "emotion_scores": encode_scores(scores),
+        "date": now.strftime("%Y-%m-%d"),
+        "time": now.strftime("%H:%M:%S"),
+        "new_title": new_title,
+    }
+
+
+def persist_chat_turns(conn, turns):
+    """Insert check-ins, rollups and chat logs and touch the conversations, in one transaction."""
+    if not turns:
+        return
+    with DB_QUERY_SECONDS.time(group="persist_chat_turns"):
+        _persist(conn, turns)
+
+
+def _persist(conn, turns):
+    cursor = conn.cursor()
+    try:
+        # Check-ins (executemany on an INSERT is sent as one multi-row INSERT)
+        cursor.executemany(
+            "INSERT INTO checkins (user_id, date, time, emotion, sentiment, emoji, emotion_scores) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            [(t["user_id"], t["date"], t["time"], t["emotion"], t["sentiment"], t["emoji"], t["emotion_scores"])
+             for t in turns]
+        )
+
+        # Daily rollups (count plus score totals), pre-aggregated so each key appears once
+        rollups = {}
+        for t in turns:
+            key = (t["user_id"], t["date"], t["emotion"], t["sentiment"])
+            totals = rollups.setdefault(key, [0] * (1 + len(ROLLUP_COLUMNS)))
+            totals[0] += 1
+            for i, value in enumerate(rollup_increment(t["emotion_scores"]), start=1):
+                totals[i] += value
+        cursor.executemany(ROLLUP_UPSERT, [key + tuple(totals) for key, totals in rollups.items()])
+
+        # User and bot messages of every turn in one multi-row INSERT
+        log_rows = []
+        for t in turns:
+            log_rows.append((t["user_id"], 'user', t["user_message"], t["emotion"], t["sentiment"], t["emotion_scores"],
+                             t["conversation_id"]))
+            log_rows.append((t["user_id"], 'bot', t["bot_reply"], None, None, None, t["conversation_id"]))
+        cursor.executemany(
+            "INSERT INTO chat_logs (user_id, message_type, content, emotion, sentiment, emotion_scores, conversation_id) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            log_rows
+        )
+
+        # Conversation timestamp, and the generated title if there is one
+        cursor.executemany(
+            "UPDATE conversations SET updated_at = CURRENT_TIMESTAMP, title = COALESCE(%s, title) WHERE id = %s",
+            [(t["new_title"], t["conversation_id"]) for t in turns]
+        )
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,156 @@
+"""Time-boxed sampling profiler for the running process.
+
+    stacks = sample(seconds=10, mode="wall")
+    text = collapse(stacks)     # "thread;outer (file.py:12);inner (file.py:40) 17" per line
+
+Samples the Python stack of every thread with sys._current_frames()
+every ``interval`` seconds, from the calling thread, for ``seconds``.
+Nothing is installed or left running outside a call, so there is no
+overhead when not profiling.
+
+Modes:
+  wall  one count per thread per sample, whatever the thread is doing.
+        Shows where requests wait (translator, MySQL, LLM, locks).
+  cpu   weights each stack by the CPU time (microseconds) its thread used
+        since the previous sample, read from /proc/self/task/<tid>. Threads
+        that sit idle drop out. CPU burnt by native threads without Python
+        frames (e.g. torch intra-op workers) is not attributed; the calling
+        thread's share is.
+
+The output is the collapsed-stack format read by flamegraph.pl,
+speedscope and similar tools.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+MODES = ("wall", "cpu")
+
+# Thread loops that are just waiting for work. Skipped with include_idle=False
+# when the thread is blocked in one of them.
+IDLE_LOOPS = {
+    ("thread.py", "_worker"),           # ThreadPoolExecutor workers
+    ("socketserver.py", "serve_forever"),
+    ("batching.py", "_collect"),        # MicroBatcher waiting for a first item
+    ("write_behind.py", "_next_batch"),
+}
+# Stdlib modules a blocked thread sits in (below the frame that waits)
+WAIT_MODULES = {"threading.py", "queue.py", "selectors.py", "socket.py", "socketserver.py"}
+
+
+class ProfilerBusy(Exception):
+    """Another profile is already running."""
+
+
+_running = threading.Lock()
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return label.replace(";", ":")
+
+
+def _stack(frame):
+    """Frame labels of a stack, outermost first."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+def _is_idle(frame):
+    """True when the thread is blocked waiting for work in one of IDLE_LOOPS."""
+    # Step over the stdlib frames doing the actual wait
+    while frame is not None:
+        key = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+        if key in IDLE_LOOPS:
+            return True
+        if key[0] not in WAIT_MODULES:
+            return False
+        frame = frame.f_back
+    return False
+
+
+def _thread_cpu_ns(native_id):
+    """CPU time of a thread in nanoseconds, or None when /proc isn't available."""
+    try:
+        with open(f"/proc/self/task/{native_id}/schedstat") as f:
+            return int(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        with open(f"/proc/self/task/{native_id}/stat") as f:
+            # Fields after the ")" of the command name; utime and stime are 14 and 15
+            fields = f.read().rsplit(")", 1)[1].split()
+        ticks = int(fields[11]) + int(fields[12])
+        return ticks * 1_000_000_000 // os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def cpu_mode_available():
+    return _thread_cpu_ns(threading.get_native_id()) is not None
+
+
+def sample(seconds=10.0, interval=0.005, mode="wall", include_idle=False):
+    """Profile all other threads for ``seconds``; returns a Counter of stack tuples.
+
+    Raises ProfilerBusy if a profile is already running and ValueError for
+    an unknown mode (or cpu mode without /proc).
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}")
+    if mode == "cpu" and not cpu_mode_available():
+        raise ValueError("cpu mode needs /proc/self/task (Linux)")
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+
+    try:
+        own_ident = threading.get_ident()
+        stacks = Counter()
+        last_cpu = {}
+        deadline = time.monotonic() + seconds
+
+        while time.monotonic() < deadline:
+            threads = {t.ident: t for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                thread = threads.get(ident)
+                name = thread.name if thread is not None else f"thread-{ident}"
+
+                weight = 1
+                if mode == "cpu":
+                    if thread is None or thread.native_id is None:
+                        continue
+                    cpu_ns = _thread_cpu_ns(thread.native_id)
+                    previous = last_cpu.get(ident)
+                    last_cpu[ident] = cpu_ns
+                    if cpu_ns is None or previous is None:
+                        continue
+                    weight = (cpu_ns - previous) // 1000
+                    if weight <= 0:
+                        continue
+
+                if not include_idle and _is_idle(frame):
+                    continue
+                stacks[(name.replace(";", ":"), *_stack(frame))] += weight
+            frame = None  # don't keep the last thread's frames alive while sleeping
+            time.sleep(interval)
+        return stacks
+    finally:
+        _running.release()
+
+
+def collapse(stacks):
+    """Collapsed-stack text, heaviest stacks first."""
+    return "".join(f"{';'.join(stack)} {count}\n" for stack, count in stacks.most_common())
+
+
+def is_running():
+    return _running.locked()
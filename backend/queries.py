@@ -0,0 +1,55 @@
+"""SQL of the queries run on (nearly) every request.
+
+app.py executes these and migrations.py EXPLAINs the same strings (see
+HOT_QUERIES there), so the index check always covers what actually runs.
+"""
+from emotion_scores import ROLLUP_COLUMNS
+
+LOGIN_BY_EMAIL = "SELECT id, password_hash FROM users WHERE email = %s"
+
+# Newest CHAT_HISTORY_MAX_ROWS messages; id breaks ties between the user and
+# bot rows of a turn, which share a timestamp
+CHAT_HISTORY = (
+    "SELECT message_type, content FROM chat_logs WHERE user_id = %s AND conversation_id = %s "
+    "ORDER BY timestamp DESC, id DESC LIMIT %s"
+)
+
+_CHECKINS_SELECT = "SELECT id, date, time, emotion, sentiment, emoji FROM checkins WHERE user_id = %s "
+_CHECKINS_AFTER = "AND (date < %s OR (date = %s AND (time < %s OR (time = %s AND id < %s)))) "
+_CHECKINS_ORDER = "ORDER BY date DESC, time DESC, id DESC"
+
+CHECKINS_LIST = _CHECKINS_SELECT + _CHECKINS_ORDER
+# Keyset pages, cursor = (date, time, id) of the last row
+CHECKINS_PAGE = _CHECKINS_SELECT + _CHECKINS_ORDER + " LIMIT %s"
+CHECKINS_PAGE_AFTER = _CHECKINS_SELECT + _CHECKINS_AFTER + _CHECKINS_ORDER + " LIMIT %s"
+
+_CONVERSATIONS_SELECT = "SELECT id, title, created_at, updated_at FROM conversations WHERE user_id = %s "
+_CONVERSATIONS_AFTER = "AND (updated_at < %s OR (updated_at = %s AND id < %s)) "
+_CONVERSATIONS_ORDER = "ORDER BY updated_at DESC, id DESC"
+
+CONVERSATIONS_LIST = _CONVERSATIONS_SELECT + _CONVERSATIONS_ORDER
+# Keyset pages, cursor = (updated_at, id) of the last row
+CONVERSATIONS_PAGE = _CONVERSATIONS_SELECT + _CONVERSATIONS_ORDER + " LIMIT %s"
+CONVERSATIONS_PAGE_AFTER = _CONVERSATIONS_SELECT + _CONVERSATIONS_AFTER + _CONVERSATIONS_ORDER + " LIMIT %s"
+
+# Chat logs oldest first, of all conversations or of one (CONVERSATION_LOGS_*)
+_CHAT_LOGS_SELECT = "SELECT id, message_type, content, emotion, sentiment, timestamp FROM chat_logs WHERE user_id = %s "
+_CHAT_LOGS_CONVERSATION = "AND conversation_id = %s "
+_CHAT_LOGS_AFTER = "AND (timestamp > %s OR (timestamp = %s AND id > %s)) "
+_CHAT_LOGS_ORDER = "ORDER BY timestamp ASC, id ASC"
+
+CHAT_LOGS_LIST = _CHAT_LOGS_SELECT + _CHAT_LOGS_ORDER
+CONVERSATION_LOGS_LIST = _CHAT_LOGS_SELECT + _CHAT_LOGS_CONVERSATION + _CHAT_LOGS_ORDER
+# Keyset pages, cursor = (timestamp, id) of the last row
+CHAT_LOGS_PAGE = _CHAT_LOGS_SELECT + _CHAT_LOGS_ORDER + " LIMIT %s"
+CHAT_LOGS_PAGE_AFTER = _CHAT_LOGS_SELECT + _CHAT_LOGS_AFTER + _CHAT_LOGS_ORDER + " LIMIT %s"
+CONVERSATION_LOGS_PAGE = _CHAT_LOGS_SELECT + _CHAT_LOGS_CONVERSATION + _CHAT_LOGS_ORDER + " LIMIT %s"
+CONVERSATION_LOGS_PAGE_AFTER = (
+    _CHAT_LOGS_SELECT + _CHAT_LOGS_CONVERSATION + _CHAT_LOGS_AFTER + _CHAT_LOGS_ORDER + " LIMIT %s"
+)
+
+# Counts and score totals per (emotion, sentiment) for rollup days >= a date
+INSIGHT_ROLLUPS = (
+    f"SELECT emotion, sentiment, SUM(count), {', '.join(f'SUM({c})' for c in ROLLUP_COLUMNS)} "
+    "FROM checkin_daily_rollups WHERE user_id = %s AND day >= %s GROUP BY emotion, sentiment"
+)
@@ -0,0 +1,259 @@
+"""Recompute emotion / sentiment (and the stored score vector) of user messages in chat_logs.
+
+    python -m backend.rescore                      # from the repo root
+    python rescore.py --workers 4 --chunk-size 512 # from backend/
+
+Rows are read in id order, chunk by chunk (keyset on the primary key, each
+chunk streamed through an unbuffered cursor), scored with
+predict_emotions_batch in a pool of worker processes, and written back
+with one executemany UPDATE per chunk. After every chunk the last written
+id goes to the checkpoint file, so an interrupted run continues where it
+stopped (use --restart to ignore the checkpoint).
+
+Rows the model failed on are not written; their ids are appended to
+<checkpoint>.failed so the checkpoint can move on. --retry-failed scores
+just those ids again and keeps the ones that still fail.
+
+Only chat_logs is updated; check-ins and their rollups are left as they
+were recorded.
+"""
+import argparse
+import collections
+import multiprocessing
+import os
+import sys
+import time
+
+# Flat imports (db, sentiment_model) live next to this file
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import mysql.connector  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+
+# Same .env as the app, read before db builds DB_CONFIG from the environment
+load_dotenv()
+
+from db import DB_CONFIG  # noqa: E402
+
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rescore.checkpoint")
+
+SELECT_CHUNK = (
+    "SELECT id, content FROM chat_logs "
+    "WHERE message_type = 'user' AND id > %s AND id <= %s ORDER BY id LIMIT %s"
+)
+SELECT_IDS = "SELECT id, content FROM chat_logs WHERE message_type = 'user' AND id IN ({}) ORDER BY id"
+UPDATE_ROW = "UPDATE chat_logs SET emotion = %s, sentiment = %s, emotion_scores = %s WHERE id = %s"
+
+
+def read_checkpoint(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def write_checkpoint(path, last_id):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(last_id))
+    os.replace(tmp_path, path)
+
+
+def failed_path(checkpoint):
+    return checkpoint + ".failed"
+
+
+def read_failed(path):
+    try:
+        with open(path) as f:
+            return sorted({int(line) for line in f if line.strip()})
+    except FileNotFoundError:
+        return []
+
+
+def append_failed(path, ids):
+    with open(path, "a") as f:
+        f.writelines(f"{row_id}\n" for row_id in ids)
+
+
+def _init_worker():
+    # Load the model once per process, before the first chunk arrives
+    from sentiment_model import load_model
+    load_model()
+
+
+def score_chunk(rows):
+    """Worker: [(id, content)] -> ([(emotion, sentiment, emotion_scores, id)], failed ids)."""
+    from emotion_scores import encode_scores
+    from sentiment_model import predict_emotions_batch
+    results = predict_emotions_batch([content or "" for _, content in rows])
+    updates = []
+    failed = []
+    for (row_id, _), result in zip(rows, results):
+        if result["source"] == "error":
+            failed.append(row_id)
+            continue
+        updates.append((result["emotion"], result["sentiment"], encode_scores(result["scores"]), row_id))
+    return updates, failed
+
+
+def read_chunks(conn, start_id, end_id, chunk_size):
+    """Yield lists of (id, content) in id order, chunk_size rows at a time."""
+    last_id = start_id
+    while True:
+        cursor = conn.cursor()  # unbuffered: rows are streamed, not loaded up front
+        cursor.execute(SELECT_CHUNK, (last_id, end_id, chunk_size))
+        rows = []
+        while True:
+            batch = cursor.fetchmany(1000)
+            if not batch:
+                break
+            rows.extend(batch)
+        cursor.close()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+        if len(rows) < chunk_size:
+            return
+
+
+def read_id_chunks(conn, ids, chunk_size):
+    """Yield lists of (id, content) for the given ids, chunk_size rows at a time."""
+    for i in range(0, len(ids), chunk_size):
+        chunk_ids = ids[i:i + chunk_size]
+        cursor = conn.cursor()
+        cursor.execute(SELECT_IDS.format(", ".join(["%s"] * len(chunk_ids))), tuple(chunk_ids))
+        rows = cursor.fetchall()
+        cursor.close()
+        if rows:
+            yield rows
+
+
+def rescore(start_id, end_id, chunk_size, workers, checkpoint, dry_run=False, retry_failed=False):
+    """Score and write back rows; returns (totals, elapsed seconds).
+
+    With ``retry_failed`` only the ids in the failed file are scored, the
+    checkpoint is left alone and the failed file is replaced by the ids
+    that failed again.
+    """
+    failed_file = failed_path(checkpoint)
+    retry_ids = None
+    if retry_failed:
+        retry_ids = read_failed(failed_file)
+        # Ids that fail again are collected separately and replace the failed
+        # file only at the end, so an interrupted retry loses nothing
+        failed_file += ".retry"
+        if os.path.exists(failed_file):
+            os.remove(failed_file)
+
+    read_conn = mysql.connector.connect(autocommit=True, **DB_CONFIG)
+    write_conn = mysql.connector.connect(autocommit=False, **DB_CONFIG)
+
+    # spawn: fresh interpreters, so torch / tokenizer threads aren't forked
+    context = multiprocessing.get_context("spawn")
+    pending = collections.deque()
+    totals = {"rows": 0, "updated": 0, "failed": 0}
+    started = time.perf_counter()
+
+    def write_oldest():
+        rows, future = pending.popleft()
+        updates, failed = future.result()
+        if updates and not dry_run:
+            cursor = write_conn.cursor()
+            try:
+                cursor.executemany(UPDATE_ROW, updates)
+                write_conn.commit()
+            except Exception:
+                write_conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        if not dry_run:
+            # Failed ids first, so moving the checkpoint past them never loses them
+            if failed:
+                append_failed(failed_file, failed)
+            if not retry_failed:
+                write_checkpoint(checkpoint, rows[-1][0])
+
+        totals["rows"] += len(rows)
+        totals["updated"] += len(updates)
+        totals["failed"] += len(failed)
+        elapsed = time.perf_counter() - started
+        print(
+            f"up to id {rows[-1][0]}: {totals['rows']} rows, {totals['updated']} updated, "
+            f"{totals['failed']} failed, {totals['rows'] / elapsed:.1f} rows/s",
+            flush=True
+        )
+
+    try:
+        with context.Pool(processes=workers, initializer=_init_worker) as pool:
+            # Keep every worker busy plus one chunk queued each; write in id order
+            if retry_failed:
+                chunks = read_id_chunks(read_conn, retry_ids, chunk_size)
+            else:
+                chunks = read_chunks(read_conn, start_id, end_id, chunk_size)
+            for rows in chunks:
+                pending.append((rows, pool.apply_async(score_chunk, (rows,))))
+                if len(pending) >= workers * 2:
+                    write_oldest()
+            while pending:
+                write_oldest()
+    finally:
+        read_conn.close()
+        write_conn.close()
+
+    if retry_failed and not dry_run:
+        if not os.path.exists(failed_file):
+            open(failed_file, "w").close()
+        os.replace(failed_file, failed_path(checkpoint))
+
+    elapsed = time.perf_counter() - started
+    return totals, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score emotion / sentiment of user messages in chat_logs")
+    parser.add_argument("--chunk-size", type=int, default=512, help="rows per chunk (one model batch job)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="worker processes")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="torch / onnxruntime threads per worker (default: EMOTION_INTRA_OP_THREADS, else 1)")
+    parser.add_argument("--start-id", type=int, default=None, help="rescore ids greater than this (default: checkpoint)")
+    parser.add_argument("--end-id", type=int, default=2 ** 31 - 1, help="last id to rescore")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the first row")
+    parser.add_argument("--retry-failed", action="store_true", help="rescore only the ids in <checkpoint>.failed")
+    parser.add_argument("--dry-run", action="store_true", help="score but don't write rows or the checkpoint")
+    args = parser.parse_args()
+
+    # Worker processes read these when they create the inference backend. An
+    # explicit --threads-per-worker wins over the environment / .env.
+    if args.threads_per_worker is not None or "EMOTION_INTRA_OP_THREADS" not in os.environ:
+        os.environ["EMOTION_INTRA_OP_THREADS"] = str(args.threads_per_worker or 1)
+    os.environ.setdefault("EMOTION_INTER_OP_THREADS", "1")
+
+    if args.start_id is not None:
+        start_id = args.start_id
+    elif args.restart:
+        start_id = 0
+    else:
+        start_id = read_checkpoint(args.checkpoint)
+    if args.retry_failed:
+        print(f"Rescoring failed ids from {failed_path(args.checkpoint)} with {args.workers} workers", flush=True)
+    else:
+        print(f"Rescoring chat_logs ids {start_id + 1}..{args.end_id} with {args.workers} workers", flush=True)
+
+    totals, elapsed = rescore(start_id, args.end_id, args.chunk_size, args.workers, args.checkpoint, args.dry_run,
+                              retry_failed=args.retry_failed)
+    rate = totals["rows"] / elapsed if elapsed else 0.0
+    print(
+        f"Done: {totals['rows']} rows, {totals['updated']} updated, {totals['failed']} failed "
+        f"in {elapsed:.1f}s ({rate:.1f} rows/s)"
+    )
+    if totals["failed"] and not args.dry_run:
+        print(f"Failed ids are in {failed_path(args.checkpoint)}, rescore them with --retry-failed")
+
+
+if __name__ == "__main__":
+    main()
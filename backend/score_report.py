@@ -0,0 +1,103 @@
+"""Summarize or export the stored emotion score vectors, without re-inference.
+
+    python score_report.py                                        # all scored check-ins
+    python score_report.py --table chat_logs --since 2026-01-01 --user-id 7
+    python score_report.py --export scores.npz                    # ids + (n, 7) float32 scores
+
+Reads the emotion_scores column in id order, chunk by chunk (keyset on
+the primary key), decodes each chunk with emotion_scores.decode_scores_bulk
+and prints summarize_scores() of all scored rows as JSON: mean score per
+emotion, mean confidence and the share of mixed messages. The model is not
+loaded.
+"""
+import argparse
+import json
+import os
+import sys
+
+# Flat imports (db, emotion_scores) live next to this file
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import mysql.connector  # noqa: E402
+import numpy as np  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+
+# Same .env as the app, read before db builds DB_CONFIG from the environment
+load_dotenv()
+
+from db import DB_CONFIG  # noqa: E402
+from emotion_scores import decode_scores_bulk, summarize_scores  # noqa: E402
+from sentiment_model import EMOTION_LABELS  # noqa: E402 (cheap: the model is loaded lazily)
+
+# table -> (base filter, date column)
+TABLES = {
+    "checkins": ("emotion_scores IS NOT NULL", "date"),
+    "chat_logs": ("message_type = 'user' AND emotion_scores IS NOT NULL", "timestamp"),
+}
+
+
+def build_query(table, since=None, until=None, user_id=None):
+    """Keyset chunk query for ``table`` and the extra parameters after the id cursor."""
+    where, date_column = TABLES[table]
+    conditions = ["id > %s", where]
+    params = []
+    if user_id is not None:
+        conditions.append("user_id = %s")
+        params.append(user_id)
+    if since:
+        conditions.append(f"{date_column} >= %s")
+        params.append(since)
+    if until:
+        conditions.append(f"{date_column} < %s")
+        params.append(until)
+    sql = f"SELECT id, emotion_scores FROM {table} WHERE {' AND '.join(conditions)} ORDER BY id LIMIT %s"
+    return sql, params
+
+
+def read_scores(conn, sql, params, chunk_size):
+    """Yield (ids, scores) per chunk; scores is a float32 array of shape (n, 7)."""
+    last_id = 0
+    while True:
+        cursor = conn.cursor()
+        cursor.execute(sql, (last_id, *params, chunk_size))
+        rows = cursor.fetchall()
+        cursor.close()
+        if not rows:
+            return
+        scores, valid = decode_scores_bulk([blob for _, blob in rows])
+        ids = np.fromiter((row_id for row_id, _ in rows), dtype=np.int64, count=len(rows))
+        yield ids[valid], scores[valid]
+        last_id = rows[-1][0]
+        if len(rows) < chunk_size:
+            return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize or export stored emotion score vectors")
+    parser.add_argument("--table", choices=sorted(TABLES), default="checkins")
+    parser.add_argument("--since", help="first date to include (YYYY-MM-DD)")
+    parser.add_argument("--until", help="first date to leave out (YYYY-MM-DD)")
+    parser.add_argument("--user-id", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--export", metavar="PATH", help="also write ids and scores to a .npz file")
+    args = parser.parse_args()
+
+    sql, params = build_query(args.table, args.since, args.until, args.user_id)
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        chunks = list(read_scores(conn, sql, params, args.chunk_size))
+    finally:
+        conn.close()
+
+    ids = np.concatenate([c[0] for c in chunks]) if chunks else np.zeros(0, dtype=np.int64)
+    scores = np.concatenate([c[1] for c in chunks]) if chunks else np.zeros((0, len(EMOTION_LABELS)), dtype=np.float32)
+
+    if args.export:
+        np.savez_compressed(args.export, ids=ids, scores=scores, labels=np.array(EMOTION_LABELS))
+        print(f"Wrote {len(ids)} rows to {args.export}", file=sys.stderr)
+
+    print(json.dumps({"table": args.table, **summarize_scores(scores, EMOTION_LABELS)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
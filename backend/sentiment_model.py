@@ -1,15 +1,103 @@
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-from deep_translator import GoogleTranslator
+# torch, transformers, numpy and deep_translator are imported lazily (see
+# load_model and _google_translator) so importing this module is cheap.
+from batching import MicroBatcher
+from translation import (
+    TranslationService, CircuitBreaker, LazyTranslator, RequestsWithTimeout, CircuitOpenError, TranslationTimeout,
+)
+from metrics import STAGE_SECONDS, EMOJI_SHORT_CIRCUITS, TRANSLATION_FALLBACKS, ERRORS
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
 import re
+import threading
+
+logger = logging.getLogger(__name__)
 
 # Emotion model
 MODEL_NAME = "j-hartmann/emotion-english-distilroberta-base"
 
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
+# torch | onnx | onnx-int8 (see inference_backends.py)
+INFERENCE_BACKEND = os.getenv("EMOTION_BACKEND", "torch")
+
+# Loaded by load_model()
+tokenizer = None
+backend = None
+
+_model_lock = threading.Lock()
+_model_ready = threading.Event()
+_model_error = None
+_warmup_thread = None
+
+# Representative inputs for the warm-up pass (short, long, question, batch)
+WARMUP_TEXTS = [
+    "ok",
+    "I feel really tired today and it makes me so sad",
+    "I'm so stressed about my exams next week, I keep overthinking everything and can't sleep",
+    "What should I do to feel better?",
+    "I finally passed my assignment, I'm so happy!",
+]
+
+# Micro-batching: concurrent requests are grouped into one forward pass
+BATCH_MAX_SIZE = int(os.getenv("EMOTION_BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("EMOTION_BATCH_MAX_WAIT_MS", "5"))
+
+# Bulk scoring (predict_emotions_batch)
+BULK_BATCH_SIZE = int(os.getenv("EMOTION_BULK_BATCH_SIZE", "32"))
+BULK_TRANSLATE_WORKERS = int(os.getenv("EMOTION_BULK_TRANSLATE_WORKERS", "8"))
+
+# Long texts are scored as overlapping token windows (at the model's max
+# length) instead of being truncated. At most EMOTION_MAX_WINDOWS per text,
+# spread evenly over it; EMOTION_WINDOW_STRIDE tokens overlap between windows.
+MAX_WINDOWS = int(os.getenv("EMOTION_MAX_WINDOWS", "4"))
+WINDOW_STRIDE = int(os.getenv("EMOTION_WINDOW_STRIDE", "64"))
+
+# Model output order
+EMOTION_LABELS = ["Anger", "Disgust", "Fear", "Joy", "Neutral", "Sadness", "Surprise"]
+
+
+# Translation cache / English fast-path
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "2048"))
+TRANSLATION_CACHE_TTL = float(os.getenv("TRANSLATION_CACHE_TTL_SECONDS", "86400"))
+TRANSLATION_SKIP_ENGLISH = os.getenv("TRANSLATION_SKIP_ENGLISH", "1") == "1"
+
+# Time budget and circuit breaker for the translator
+TRANSLATION_TIMEOUT = float(os.getenv("TRANSLATION_TIMEOUT_SECONDS", "2"))
+TRANSLATION_BREAKER_FAILURES = int(os.getenv("TRANSLATION_BREAKER_FAILURES", "5"))
+TRANSLATION_BREAKER_RESET = float(os.getenv("TRANSLATION_BREAKER_RESET_SECONDS", "30"))
+# Connect / read timeout of the translator's HTTP requests, so an abandoned
+# call frees its worker thread instead of hanging on a dead connection
+TRANSLATION_HTTP_TIMEOUT = float(os.getenv("TRANSLATION_HTTP_TIMEOUT_SECONDS", str(TRANSLATION_TIMEOUT)))
+
+
+def _google_translator():
+    from deep_translator import GoogleTranslator
+    from deep_translator import google as google_module
+    # deep_translator calls requests.get() without a timeout
+    if not isinstance(google_module.requests, RequestsWithTimeout):
+        google_module.requests = RequestsWithTimeout(google_module.requests, TRANSLATION_HTTP_TIMEOUT)
+    return GoogleTranslator(source="auto", target="en")
+
+
+translator = LazyTranslator(_google_translator)
+
+_translation = TranslationService(
+    translator,
+    cache_size=TRANSLATION_CACHE_SIZE,
+    cache_ttl=TRANSLATION_CACHE_TTL,
+    skip_english=TRANSLATION_SKIP_ENGLISH,
+    timeout=TRANSLATION_TIMEOUT,
+    breaker=CircuitBreaker(
+        failure_threshold=TRANSLATION_BREAKER_FAILURES,
+        reset_timeout=TRANSLATION_BREAKER_RESET,
+    ),
+)
+
+
+def set_translator(new_translator):
+    """Swap the underlying translator (e.g. translation.FakeTranslator in tests)."""
+    _translation.translator = new_translator
+    _translation.cache.clear()
 
-translator = GoogleTranslator(source="auto", target="en")
 
 # Emoji to emotion mapping
 EMOJI_TO_EMOTION = {
@@ -35,76 +123,108 @@ EMOJI_TO_EMOTION = {
 }
 
 
+# Single emoji code points outside the known table. One match per emoji
+# (plus any variation selector / skin tone / ZWJ sequence), never a run.
+_EMOJI_CHARS = (
+    "\U0001F600-\U0001F64F"  # emoticons
+    "\U0001F300-\U0001F5FF"  # symbols & pictographs
+    "\U0001F680-\U0001F6FF"  # transport & map symbols
+    "\U0001F1E0-\U0001F1FF"  # flags (iOS)
+    "\U00002600-\U000027BF"  # misc symbols / dingbats
+    "\U0001F900-\U0001F9FF"  # supplemental symbols (includes 🤢)
+    "\U000024C2"
+    "\U0001F170-\U0001F251"  # enclosed alphanumerics / ideographs
+)
+_EMOJI_TAIL = "[\uFE0E\uFE0F\U0001F3FB-\U0001F3FF]*"
+
+
+def _build_emoji_matcher(emoji_map):
+    """Compile the emoji regex once and index EMOJI_TO_EMOTION for it.
+
+    The pattern matches one emoji at a time, with its variation selector,
+    skin tone and ZWJ parts, so multi-code-point ones like '☹️' stay whole.
+    Returns (pattern, lookup) where lookup maps a match to its
+    EMOJI_TO_EMOTION key. Every emoji is in there with and without a
+    trailing U+FE0F, so matches are looked up as they are.
+    """
+    lookup = {}
+    for emoji in emoji_map:
+        bare = emoji.replace("\uFE0F", "")
+        lookup[bare] = emoji
+        lookup[bare + "\uFE0F"] = emoji
+    pattern = re.compile(f"[{_EMOJI_CHARS}]{_EMOJI_TAIL}(?:\u200D[{_EMOJI_CHARS}]{_EMOJI_TAIL})*")
+    return pattern, lookup
+
+
+_EMOJI_PATTERN, _EMOJI_LOOKUP = _build_emoji_matcher(EMOJI_TO_EMOTION)
+# Match (either spelling) -> emotion, for counting without an extra lookup
+_EMOJI_EMOTION = {key: EMOJI_TO_EMOTION[emoji] for key, emoji in _EMOJI_LOOKUP.items()}
+
+
 def extract_emojis(text):
-    """Extract all emojis from text."""
-    emoji_pattern = re.compile(
-        "["
-        "\U0001F600-\U0001F64F"  # emoticons
-        "\U0001F300-\U0001F5FF"  # symbols & pictographs
-        "\U0001F680-\U0001F6FF"  # transport & map symbols
-        "\U0001F1E0-\U0001F1FF"  # flags (iOS)
-        "\U00002600-\U000027BF"  # misc symbols
-        "\U0001F900-\U0001F9FF"  # supplemental symbols (includes 🤢)
-        "\U00002702-\U000027B0"
-        "\U000024C2-\U0001F251"
-        "]+", 
-        flags=re.UNICODE
-    )
-    emojis = emoji_pattern.findall(text)
-    print(f"DEBUG: Extracted emojis from '{text}': {emojis}")  # Debug logging
+    """Extract all emojis from text, one entry per emoji."""
+    # Every emoji is non-ASCII, so plain text never reaches the regex
+    if text.isascii():
+        return []
+    emojis = [_EMOJI_LOOKUP.get(e, e) for e in _EMOJI_PATTERN.findall(text)]
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Extracted emojis from %r: %s", text, emojis)
     return emojis
 
 
 def detect_emotion_from_emojis(text):
     """Detect emotion based on emojis in the text."""
-    emojis = extract_emojis(text)
-    
-    if not emojis:
-        print("DEBUG: No emojis found in text")
+    if text.isascii():
         return None, None
-    
-    # Count emotions from emojis
+
+    # Count emotions straight from the matches
     emotion_counts = {}
-    for emoji in emojis:
-        emotion = EMOJI_TO_EMOTION.get(emoji)
-        print(f"DEBUG: Emoji '{emoji}' mapped to emotion '{emotion}'")
+    for emoji in _EMOJI_PATTERN.findall(text):
+        emotion = _EMOJI_EMOTION.get(emoji)
         if emotion:
             emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-    
+
     if not emotion_counts:
-        print("DEBUG: No emotions mapped from emojis")
         return None, None
-    
-    # Get most common emotion
-    dominant_emotion = max(emotion_counts, key=emotion_counts.get)
-    print(f"DEBUG: Dominant emotion from emojis: {dominant_emotion}")
-    
-    # Map to sentiment
-    positive = ["Joy", "Surprise"]
-    negative = ["Anger", "Disgust", "Fear", "Sadness"]
-    
-    if dominant_emotion in positive:
-        sentiment = "Positive"
-    elif dominant_emotion in negative:
-        sentiment = "Negative"
+
+    # Get most common emotion (ties go to the emotion seen first)
+    if len(emotion_counts) == 1:
+        dominant_emotion = next(iter(emotion_counts))
     else:
-        sentiment = "Neutral"
-    
-    print(f"DEBUG: Final emotion={dominant_emotion}, sentiment={sentiment}")
+        dominant_emotion = max(emotion_counts, key=emotion_counts.get)
+    sentiment = sentiment_for_emotion(dominant_emotion)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Emoji emotion counts %s -> emotion=%s, sentiment=%s", emotion_counts, dominant_emotion, sentiment)
     return dominant_emotion, sentiment
 
 
 def safe_translate(text):
     """Translate but avoid returning empty or broken results."""
     try:
-        result = translator.translate(text)
+        with STAGE_SECONDS.time(stage="translate"):
+            result = _translation.translate(text)
         if result is None or result.strip() == "":
+            TRANSLATION_FALLBACKS.inc(reason="empty")
             return text  # fallback: use original text
         return result
-    except:
+    except CircuitOpenError:
+        TRANSLATION_FALLBACKS.inc(reason="circuit_open")
+        return text
+    except TranslationTimeout:
+        TRANSLATION_FALLBACKS.inc(reason="timeout")
+        return text
+    except Exception as e:
+        TRANSLATION_FALLBACKS.inc(reason="error")
+        logger.warning("Translation failed, using original text: %s", e)
         return text     # fallback if translation API fails
 
 
+def get_translation_stats():
+    """English fast-path, cache hit/miss and circuit breaker counters."""
+    return _translation.stats()
+
+
 def clean_text(text):
     """Basic cleaning to improve model accuracy."""
     text = text.strip()
@@ -112,7 +232,170 @@ def clean_text(text):
     return text
 
 
-def predict_emotion_and_sentiment(text):
+POSITIVE_EMOTIONS = frozenset(["Joy", "Surprise"])
+NEGATIVE_EMOTIONS = frozenset(["Anger", "Disgust", "Fear", "Sadness"])
+
+
+def sentiment_for_emotion(emotion):
+    """Map an emotion label to Positive / Negative / Neutral."""
+    if emotion in POSITIVE_EMOTIONS:
+        return "Positive"
+    elif emotion in NEGATIVE_EMOTIONS:
+        return "Negative"
+    return "Neutral"
+
+
+def load_model():
+    """Load the tokenizer and inference backend once. Safe to call from any thread."""
+    global tokenizer, backend
+    if backend is not None:
+        return
+    with _model_lock:
+        if backend is not None:
+            return
+        from transformers import AutoTokenizer
+        from inference_backends import create_backend
+
+        loaded_tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        loaded_backend = create_backend(INFERENCE_BACKEND, MODEL_NAME)
+        tokenizer, backend = loaded_tokenizer, loaded_backend
+
+
+def warm_up():
+    """Load the model and run warm-up forward passes so the first request is not cold."""
+    global _model_error
+    try:
+        load_model()
+        for text in WARMUP_TEXTS:
+            _score_batch([text])
+        _score_batch(WARMUP_TEXTS)
+        _model_error = None
+        _model_ready.set()
+    except Exception as e:
+        _model_error = str(e)
+        ERRORS.inc(component="emotion_model")
+        logger.exception("Emotion model warm-up failed")
+
+
+def start_model_warmup():
+    """Start warm_up() in a background thread (only once)."""
+    global _warmup_thread
+    with _model_lock:
+        if _warmup_thread is not None and (_warmup_thread.is_alive() or _model_ready.is_set()):
+            return
+        _warmup_thread = threading.Thread(target=warm_up, name="emotion-warmup", daemon=True)
+        _warmup_thread.start()
+
+
+def is_model_ready():
+    """True once the model is loaded and warmed up."""
+    return _model_ready.is_set()
+
+
+def get_model_status():
+    return {
+        "backend": INFERENCE_BACKEND,
+        "loaded": backend is not None,
+        "warmed_up": _model_ready.is_set(),
+        "warming_up": _warmup_thread is not None and _warmup_thread.is_alive(),
+        "error": _model_error,
+    }
+
+
+def _forward(inputs):
+    """Run the model on already tokenized inputs, return softmax scores per row."""
+    from inference_backends import softmax
+
+    with STAGE_SECONDS.time(stage="forward"):
+        return softmax(backend.logits(inputs)).tolist()
+
+
+def _pick_windows(rows, max_windows):
+    """At most max_windows of rows, evenly spaced and always including the first and last."""
+    if len(rows) <= max_windows:
+        return rows
+    if max_windows <= 1:
+        return rows[:1]
+    last = len(rows) - 1
+    return [rows[round(i * last / (max_windows - 1))] for i in range(max_windows)]
+
+
+def _tokenize_windows(texts):
+    """Tokenize texts into overlapping windows of at most the model's max length.
+
+    Returns (features, owners, lengths): one unpadded feature dict per
+    window, the index of the text it belongs to and its token count.
+    """
+    with STAGE_SECONDS.time(stage="tokenize"):
+        encodings = tokenizer(texts, truncation=True, return_overflowing_tokens=True, stride=WINDOW_STRIDE)
+    mapping = encodings.get("overflow_to_sample_mapping") or list(range(len(texts)))
+    keys = [key for key in tokenizer.model_input_names if key in encodings]
+
+    rows_per_text = [[] for _ in texts]
+    for row, owner in enumerate(mapping):
+        rows_per_text[owner].append(row)
+
+    features, owners, lengths = [], [], []
+    for owner, rows in enumerate(rows_per_text):
+        for row in _pick_windows(rows, MAX_WINDOWS):
+            features.append({key: encodings[key][row] for key in keys})
+            owners.append(owner)
+            lengths.append(len(encodings["input_ids"][row]))
+    return features, owners, lengths
+
+
+def _aggregate_windows(window_scores, owners, lengths, count):
+    """Length-weighted mean of the window scores of each text.
+
+    A text gets None if any of its windows has no scores (failed batch).
+    """
+    sums = [[0.0] * len(EMOTION_LABELS) for _ in range(count)]
+    weights = [0] * count
+    failed = set()
+    for scores, owner, length in zip(window_scores, owners, lengths):
+        if scores is None:
+            failed.add(owner)
+            continue
+        for k, score in enumerate(scores):
+            sums[owner][k] += score * length
+        weights[owner] += length
+    return [
+        None if i in failed or not weights[i] else [total / weights[i] for total in sums[i]]
+        for i in range(count)
+    ]
+
+
+def _score_batch(texts):
+    """Score a list of texts with a single forward pass over all their windows.
+
+    Returns one list of softmax scores per text.
+    """
+    load_model()
+    features, owners, lengths = _tokenize_windows(texts)
+    with STAGE_SECONDS.time(stage="pad"):
+        inputs = tokenizer.pad(features, return_tensors=backend.return_tensors)
+    return _aggregate_windows(_forward(inputs), owners, lengths, len(texts))
+
+
+_batcher = MicroBatcher(
+    _score_batch,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+    name="emotion-batcher",
+)
+
+
+def get_batcher_stats():
+    """Queue depth and batch-size histogram of the inference batcher."""
+    return _batcher.stats()
+
+
+def predict_emotion_with_scores(text):
+    """Emotion, sentiment and the model's 7 scores (EMOTION_LABELS order).
+
+    The scores are None when the label didn't come from the model (emojis
+    decided it, or the model failed).
+    """
     try:
         text = clean_text(text)
         
@@ -121,47 +404,102 @@ def predict_emotion_and_sentiment(text):
         
         # If emojis provide clear emotion, use that
         if emoji_emotion and emoji_sentiment:
-            return emoji_emotion, emoji_sentiment
+            EMOJI_SHORT_CIRCUITS.inc()
+            return emoji_emotion, emoji_sentiment, None
 
         # Otherwise, use text-based detection
         # Translate safely
         text_en = safe_translate(text)
 
-        # Tokenize
-        inputs = tokenizer(text_en, return_tensors="pt", truncation=True, padding=True)
+        # Tokenize + forward pass, batched with other concurrent requests
+        scores = _batcher.submit(text_en).result()
 
-        with torch.no_grad():
-            outputs = model(**inputs)
-            scores = torch.softmax(outputs.logits, dim=1)
+        pred_idx = max(range(len(scores)), key=scores.__getitem__)
 
-        pred_idx = torch.argmax(scores).item()
+        emotion = EMOTION_LABELS[pred_idx] if pred_idx < len(EMOTION_LABELS) else "Unknown"
+        sentiment = sentiment_for_emotion(emotion)
+
+        return emotion, sentiment, scores
+
+    except Exception:
+        ERRORS.inc(component="emotion_model")
+        logger.exception("Emotion model error")
+        return "Unknown", "Unknown", None
+
+
+def predict_emotion_and_sentiment(text):
+    emotion, sentiment, _ = predict_emotion_with_scores(text)
+    return emotion, sentiment
 
-        emotion_map = {
-            0: "Anger",
-            1: "Disgust",
-            2: "Fear",
-            3: "Joy",
-            4: "Neutral",
-            5: "Sadness",
-            6: "Surprise"
-        }
 
-        emotion = emotion_map.get(pred_idx, "Unknown")
+def predict_emotions_batch(texts, batch_size=None):
+    """Score many texts at once (backfills, re-scoring, /api/analyze/batch).
 
-        # Better sentiment rules
-        positive = ["Joy", "Surprise"]
-        negative = ["Anger", "Disgust", "Fear", "Sadness"]
-        neutral = ["Neutral"]
+    Emojis are checked per item first. The remaining texts are translated
+    concurrently (each distinct text only once) and tokenized into windows
+    in one call. Windows are sorted by token length and run through the
+    model in batches of ``batch_size`` so each batch pads to a similar
+    length, then averaged per text.
 
-        if emotion in positive:
-            sentiment = "Positive"
-        elif emotion in negative:
-            sentiment = "Negative"
+    Returns one dict per input: emotion, sentiment, source ("emoji",
+    "model" or "error") and scores (7 floats in EMOTION_LABELS order, or
+    None when the model was not used).
+    """
+    batch_size = batch_size or BULK_BATCH_SIZE
+    results = [None] * len(texts)
+
+    # Emoji short-circuit per item
+    pending = []  # (index, cleaned text)
+    for i, raw in enumerate(texts):
+        text = clean_text(raw or "")
+        emoji_emotion, emoji_sentiment = detect_emotion_from_emojis(text)
+        if emoji_emotion and emoji_sentiment:
+            EMOJI_SHORT_CIRCUITS.inc()
+            results[i] = {"emotion": emoji_emotion, "sentiment": emoji_sentiment, "source": "emoji", "scores": None}
         else:
-            sentiment = "Neutral"
+            pending.append((i, text))
 
-        return emotion, sentiment
+    if not pending:
+        return results
 
-    except Exception as e:
-        print("Emotion model error:", e)
-        return "Unknown", "Unknown"
+    # Translate each distinct text once, in parallel
+    unique_texts = list(dict.fromkeys(text for _, text in pending))
+    workers = max(1, min(BULK_TRANSLATE_WORKERS, len(unique_texts)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        translated = dict(zip(unique_texts, executor.map(safe_translate, unique_texts)))
+    texts_en = [translated[text] for _, text in pending]
+
+    load_model()
+
+    # Tokenize everything once into windows (no padding), then bucket by length
+    features, owners, lengths = _tokenize_windows(texts_en)
+    order = sorted(range(len(features)), key=lengths.__getitem__)
+    window_scores = [None] * len(features)
+
+    for start in range(0, len(order), batch_size):
+        chunk = order[start:start + batch_size]
+        try:
+            with STAGE_SECONDS.time(stage="pad"):
+                inputs = tokenizer.pad([features[j] for j in chunk], return_tensors=backend.return_tensors)
+            batch_scores = _forward(inputs)
+        except Exception:
+            ERRORS.inc(component="emotion_model")
+            logger.exception("Emotion model batch error")
+            continue
+        for j, scores in zip(chunk, batch_scores):
+            window_scores[j] = scores
+
+    for j, scores in enumerate(_aggregate_windows(window_scores, owners, lengths, len(pending))):
+        if scores is None:
+            results[pending[j][0]] = {"emotion": "Unknown", "sentiment": "Unknown", "source": "error", "scores": None}
+            continue
+        pred_idx = max(range(len(scores)), key=scores.__getitem__)
+        emotion = EMOTION_LABELS[pred_idx]
+        results[pending[j][0]] = {
+            "emotion": emotion,
+            "sentiment": sentiment_for_emotion(emotion),
+            "source": "model",
+            "scores": scores,
+        }
+
+    return results
@@ -0,0 +1,17 @@
+-- Per-user, per-day check-in counts, kept up to date by /api/chat
+-- (add_emotion_scores.sql adds the score total columns the app also writes)
+CREATE TABLE checkin_daily_rollups (
+  user_id INT NOT NULL,
+  day DATE NOT NULL,
+  emotion VARCHAR(50) NOT NULL,
+  sentiment VARCHAR(50) NOT NULL,
+  count INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, day, emotion, sentiment),
+  FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Backfill from existing check-ins
+INSERT INTO checkin_daily_rollups (user_id, day, emotion, sentiment, count)
+SELECT user_id, date, emotion, sentiment, COUNT(*)
+FROM checkins
+GROUP BY user_id, date, emotion, sentiment;
@@ -0,0 +1,24 @@
+-- Emotion score vectors (same as migrations.py versions 4 and 5)
+-- Run after add_checkin_rollups.sql
+
+-- The model's 7 scores, one byte each (see emotion_scores.py); NULL when
+-- the label came from emojis
+ALTER TABLE checkins
+  ADD COLUMN emotion_scores BINARY(7) NULL;
+
+ALTER TABLE chat_logs
+  ADD COLUMN emotion_scores BINARY(7) NULL;
+
+-- Running totals of those bytes per rollup row (emotion_scores.ROLLUP_COLUMNS).
+-- No backfill needed: no check-in has scores before this script runs.
+ALTER TABLE checkin_daily_rollups
+  ADD COLUMN scored_count INT NOT NULL DEFAULT 0,
+  ADD COLUMN score_top_sum INT NOT NULL DEFAULT 0,
+  ADD COLUMN mixed_count INT NOT NULL DEFAULT 0,
+  ADD COLUMN score_sum_0 INT NOT NULL DEFAULT 0,
+  ADD COLUMN score_sum_1 INT NOT NULL DEFAULT 0,
+  ADD COLUMN score_sum_2 INT NOT NULL DEFAULT 0,
+  ADD COLUMN score_sum_3 INT NOT NULL DEFAULT 0,
+  ADD COLUMN score_sum_4 INT NOT NULL DEFAULT 0,
+  ADD COLUMN score_sum_5 INT NOT NULL DEFAULT 0,
+  ADD COLUMN score_sum_6 INT NOT NULL DEFAULT 0;
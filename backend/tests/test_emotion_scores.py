@@ -0,0 +1,72 @@
+"""Encoding of emotion score vectors and the rollup totals built from them.
+
+    python -m pytest backend/tests
+"""
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emotion_scores import (  # noqa: E402
+    NUM_SCORES, ROLLUP_COLUMNS, decode_scores_bulk, encode_scores, rollup_increment, summarize_rollup,
+    summarize_scores,
+)
+
+LABELS = ["Anger", "Disgust", "Fear", "Joy", "Neutral", "Sadness", "Surprise"]
+
+
+def random_scores(n, seed=0):
+    return np.random.default_rng(seed).dirichlet(np.ones(NUM_SCORES), size=n)
+
+
+def test_encode_then_bulk_decode_round_trips_within_quantization_error():
+    scores = random_scores(50)
+    blobs = [encode_scores(row) for row in scores]
+    assert all(len(blob) == NUM_SCORES for blob in blobs)
+
+    decoded, valid = decode_scores_bulk(blobs)
+    assert decoded.shape == (50, NUM_SCORES)
+    assert decoded.dtype == np.float32
+    assert valid.all()
+    assert np.abs(decoded - scores).max() <= 0.5 / 255 + 1e-6
+
+
+def test_bulk_decode_marks_null_and_malformed_values_invalid():
+    blob = encode_scores(random_scores(1)[0])
+    decoded, valid = decode_scores_bulk([None, blob, b"short", bytearray(blob)])
+    assert valid.tolist() == [False, True, False, True]
+    assert not decoded[0].any() and not decoded[2].any()
+    assert np.array_equal(decoded[1], decoded[3])
+
+
+def test_encode_keeps_none_and_rejects_the_wrong_length():
+    assert encode_scores(None) is None
+    with pytest.raises(ValueError):
+        encode_scores([0.5, 0.5])
+
+
+def test_rollup_totals_give_the_same_summary_as_the_raw_rows():
+    blobs = [encode_scores(row) for row in random_scores(40, seed=1)] + [None]
+    totals = [0] * len(ROLLUP_COLUMNS)
+    for blob in blobs:
+        for i, value in enumerate(rollup_increment(blob)):
+            totals[i] += value
+
+    decoded, valid = decode_scores_bulk(blobs)
+    expected = summarize_scores(decoded[valid], LABELS)
+    actual = summarize_rollup(totals, LABELS)
+
+    assert actual["scored"] == expected["scored"] == 40
+    assert actual["mixed_share"] == expected["mixed_share"]
+    assert actual["mean_confidence"] == pytest.approx(expected["mean_confidence"], abs=0.001)
+    for label in LABELS:
+        assert actual["mean_scores"][label] == pytest.approx(expected["mean_scores"][label], abs=0.001)
+
+
+def test_summaries_of_nothing_are_empty():
+    assert summarize_rollup([0] * len(ROLLUP_COLUMNS), LABELS)["mean_scores"] is None
+    assert summarize_scores(np.zeros((0, NUM_SCORES), dtype=np.float32), LABELS)["scored"] == 0
@@ -0,0 +1,96 @@
+"""TranslationService timeouts and circuit breaker, with FakeTranslator.
+
+    python -m pytest backend/tests
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from translation import (  # noqa: E402
+    CircuitBreaker, FakeTranslator, RequestsWithTimeout, TranslationService, TranslationTimeout,
+)
+
+
+def make_service(translator, timeout, failures=2, reset=0.3, max_workers=2):
+    breaker = CircuitBreaker(failure_threshold=failures, reset_timeout=reset)
+    service = TranslationService(translator, skip_english=False, timeout=timeout, breaker=breaker,
+                                 max_workers=max_workers)
+    return service, breaker
+
+
+def test_hung_translator_recovers_after_reset_even_with_stuck_workers():
+    fake = FakeTranslator(delay=1.0)
+    service, breaker = make_service(fake, timeout=0.1)
+
+    for text in ("saya penat", "saya sedih"):
+        try:
+            service.translate(text)
+        except TranslationTimeout:
+            pass
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # Healthy again, but both pool threads are still stuck in the hung calls
+    fake.delay = 0.0
+    time.sleep(0.35)
+
+    start = time.monotonic()
+    assert service.translate("saya gembira") == "saya gembira"
+    assert time.monotonic() - start < 0.1
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_waiting_for_a_pool_thread_does_not_open_the_breaker():
+    fake = FakeTranslator(delay=0.15)
+    service, breaker = make_service(fake, timeout=0.2, max_workers=1)
+
+    outcomes = []
+
+    def call(i):
+        try:
+            outcomes.append(service.translate(f"mesej {i}"))
+        except TranslationTimeout:
+            outcomes.append("timeout")
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = service.stats()
+    assert "timeout" in outcomes
+    assert stats["queue_timeouts"] >= 1
+    assert stats["timeouts"] == 0
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_translator_that_is_too_slow_opens_the_breaker():
+    service, breaker = make_service(FakeTranslator(delay=0.3), timeout=0.05)
+
+    for text in ("saya penat", "saya sedih"):
+        try:
+            service.translate(text)
+        except TranslationTimeout:
+            pass
+    assert service.stats()["timeouts"] == 2
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_requests_with_timeout_adds_a_default_timeout():
+    calls = []
+
+    class Requests:
+        codes = "codes"
+
+        def get(self, url, **kwargs):
+            calls.append(kwargs)
+
+    requests = RequestsWithTimeout(Requests(), timeout=2.0)
+    requests.get("https://example.com", params={})
+    requests.get("https://example.com", timeout=5)
+
+    assert calls == [{"params": {}, "timeout": 2.0}, {"timeout": 5}]
+    assert requests.codes == "codes"
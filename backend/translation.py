@@ -0,0 +1,330 @@
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from cache import TTLCache
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the translator while the breaker is open."""
+
+
+class TranslationTimeout(Exception):
+    """The translator did not answer within the per-call time budget."""
+
+# Common English function words / chat words. A message made mostly of
+# these is treated as English and never sent to the translator.
+ENGLISH_WORDS = frozenset("""
+a about after again all also am an and any are as at be because been before
+being but by can can't cannot could did didn't do does doesn't doing don't
+down for from get got had has have having he her here him his how i i'd i'll
+i'm i've if in into is isn't it it's its just like me more most my myself no
+not now of off ok okay on once only or other our out over really same she
+should so some still such than thank thanks that the their them then there
+these they this those through to too today tomorrow under until up very was
+wasn't we were what when where which while who why will with won't would yes
+yeah you you're your feel feeling felt tired sad happy angry stressed
+anxious bad good great fine sorry hi hello hey bye please want need help
+know think day week exam exams study class
+""".split())
+
+# Frequent Malay / Indonesian words. Their romanized spelling is plain ASCII,
+# so they need their own check.
+MALAY_WORDS = frozenset("""
+saya aku awak kamu dia kami kita mereka tak tidak bukan dan yang ini itu
+ada sangat sikit nak mahu boleh dengan untuk dalam pada ke dari sudah dah
+belum lagi juga tapi tetapi kenapa mengapa apa siapa bila mana macam
+penat sedih gembira marah takut risau rasa hari esok semalam kelas
+""".split())
+
+_WORD_RE = re.compile(r"[a-z']+")
+
+
+def normalize_text(text):
+    """Cache key form of a message: collapsed whitespace, case-folded."""
+    return " ".join(text.split()).casefold()
+
+
+def looks_english(text):
+    """Cheap local check: is this message (probably) already English?
+
+    Any non-ASCII letters mean it is not. Otherwise the message is English
+    when enough of its words are common English words and they outnumber
+    common Malay words. When unsure, returns False so the text still goes
+    through the translator.
+    """
+    letters = [c for c in text if c.isalpha()]
+    if not letters:
+        return True  # digits / punctuation only, nothing to translate
+    if any(ord(c) > 127 for c in letters):
+        return False
+
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return True
+
+    english_hits = sum(1 for w in words if w in ENGLISH_WORDS)
+    malay_hits = sum(1 for w in words if w in MALAY_WORDS)
+    if malay_hits >= english_hits:
+        return False
+
+    if len(words) <= 3:
+        return english_hits >= 1
+    return english_hits / len(words) >= 0.3
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with half-open probing.
+
+    closed    -> calls go through; ``failure_threshold`` failures in a row open it
+    open      -> calls are refused until ``reset_timeout`` seconds have passed
+    half_open -> a single probe call is let through; success closes the
+                 breaker, failure opens it again
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def allow_request(self):
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if self.clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            # Half-open: only one probe at a time
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.times_opened += 1
+                self._state = self.OPEN
+                self._opened_at = self.clock()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "times_opened": self.times_opened,
+            }
+
+
+class LazyTranslator:
+    """Builds the real translator on first use, so importing stays cheap."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._translator = None
+        self._lock = threading.Lock()
+
+    def translate(self, text):
+        if self._translator is None:
+            with self._lock:
+                if self._translator is None:
+                    self._translator = self.factory()
+        return self._translator.translate(text)
+
+
+class RequestsWithTimeout:
+    """Stand-in for the ``requests`` module that adds a default timeout.
+
+    deep_translator calls requests.get() without one, so a hung connection
+    would block its worker thread forever.
+    """
+
+    def __init__(self, requests_module, timeout):
+        self._requests = requests_module
+        self.timeout = timeout
+
+    def get(self, *args, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self._requests.get(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._requests, name)
+
+
+class FakeTranslator:
+    """Local stand-in for GoogleTranslator with injectable delay and errors.
+
+    ``delay`` seconds are slept on every call; a call fails with
+    ConnectionError when ``fail`` is set or with probability ``error_rate``.
+    Translations come from ``mapping`` and default to the input text.
+    """
+
+    def __init__(self, delay=0.0, error_rate=0.0, fail=False, mapping=None, seed=None):
+        self.delay = delay
+        self.error_rate = error_rate
+        self.fail = fail
+        self.mapping = mapping or {}
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def translate(self, text):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail or (self.error_rate and self._random.random() < self.error_rate):
+            raise ConnectionError("fake translator failure")
+        return self.mapping.get(text, text)
+
+
+class TranslationService:
+    """Translator front-end with an English fast-path and an LRU/TTL cache.
+
+    Remote calls run on a small thread pool so each one can be given a
+    ``timeout`` budget, and go through ``breaker`` (if given) so a failing
+    translator is skipped entirely instead of being waited on.
+
+    The budget covers the call itself: a call still waiting for a pool
+    thread after ``timeout`` seconds is abandoned without counting against
+    the breaker (the pool is busy, the translator may be fine). The
+    half-open probe runs on its own thread so it never waits behind calls
+    stuck in the pool.
+    """
+
+    def __init__(self, translator, cache_size=2048, cache_ttl=None, skip_english=True,
+                 timeout=None, breaker=None, max_workers=4):
+        self.translator = translator
+        self.cache = TTLCache(max_size=cache_size, ttl=cache_ttl)
+        self.skip_english = skip_english
+        self.timeout = timeout
+        self.breaker = breaker
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="translate")
+        self._lock = threading.Lock()
+        self.english_skips = 0
+        self.remote_calls = 0
+        self.short_circuits = 0
+        self.timeouts = 0
+        self.queue_timeouts = 0
+        self.failures = 0
+
+    def translate(self, text):
+        """Translate ``text`` to English.
+
+        Raises CircuitOpenError while the breaker is open, TranslationTimeout
+        when the call exceeds the budget, and re-raises translator errors.
+        """
+        if self.skip_english and looks_english(text):
+            with self._lock:
+                self.english_skips += 1
+            return text
+
+        key = normalize_text(text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        result = self._call_translator(text)
+
+        # Only remember usable results
+        if result is not None and result.strip() != "":
+            self.cache.set(key, result)
+        return result
+
+    def _call_translator(self, text):
+        if self.breaker is not None and not self.breaker.allow_request():
+            with self._lock:
+                self.short_circuits += 1
+            raise CircuitOpenError("translator circuit is open")
+
+        probe = self.breaker is not None and self.breaker.state == CircuitBreaker.HALF_OPEN
+        started = threading.Event()
+
+        def call():
+            started.set()
+            return self.translator.translate(text)
+
+        with self._lock:
+            self.remote_calls += 1
+        future = self._run_probe(call) if probe else self._executor.submit(call)
+        try:
+            if not started.wait(self.timeout) and future.cancel():
+                with self._lock:
+                    self.queue_timeouts += 1
+                raise TranslationTimeout(f"no translator thread free within {self.timeout}s")
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise TranslationTimeout(f"translation took longer than {self.timeout}s")
+        except TranslationTimeout:
+            raise
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise
+
+        if self.breaker is not None:
+            self.breaker.record_success()
+        return result
+
+    @staticmethod
+    def _run_probe(fn):
+        """Run ``fn`` on a dedicated thread, returning a Future for its result."""
+        future = Future()
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="translate-probe", daemon=True).start()
+        return future
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "english_skips": self.english_skips,
+                "remote_calls": self.remote_calls,
+                "short_circuits": self.short_circuits,
+                "timeouts": self.timeouts,
+                "queue_timeouts": self.queue_timeouts,
+                "failures": self.failures,
+            }
+        stats["cache"] = self.cache.stats()
+        if self.breaker is not None:
+            stats["breaker"] = self.breaker.stats()
+        return stats
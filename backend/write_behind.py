@@ -0,0 +1,160 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from metrics import ERRORS
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """Bounded in-process queue drained by one writer thread in batches.
+
+    ``write_fn(records)`` must write a whole list of records (e.g. with
+    executemany) and raise on failure.
+
+    Guarantees:
+      * Records are written within about ``flush_interval`` seconds while the
+        database is healthy; at most ``max_size`` records are ever pending.
+      * When the queue is full, submit() waits up to ``put_timeout`` and then
+        returns False so the caller can write synchronously (backpressure,
+        nothing is dropped for being full).
+      * A failed batch is retried ``max_retries`` times with backoff. If it
+        still fails, its records are written one at a time so that one bad
+        record (bad data, a deleted user) only drops itself, not the rest
+        of the batch.
+      * close() (also run at interpreter exit) stops intake and flushes
+        everything still queued.
+    """
+
+    def __init__(self, write_fn, max_size=1000, batch_size=100, flush_interval=0.2,
+                 put_timeout=0.05, max_retries=3, name="write-behind"):
+        self.write_fn = write_fn
+        self.max_size = max_size
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.name = name
+
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # Stats
+        self.written = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.last_batch_size = 0
+        self.last_write_lag = 0.0
+
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def submit(self, record):
+        """Queue a record. Returns False if it was not queued (full or closed)."""
+        if self._closed:
+            return False
+        try:
+            self._queue.put((time.monotonic(), record), timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+
+    def _next_batch(self):
+        """Wait up to flush_interval for a first record, then drain up to batch_size."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        records = [record for _, record in batch]
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.write_fn(records)
+                with self._lock:
+                    self.written += len(records)
+                    self.batches += 1
+                    self.last_batch_size = len(records)
+                    self.last_write_lag = time.monotonic() - batch[0][0]
+                return
+            except Exception as e:
+                with self._lock:
+                    self.failed_batches += 1
+                ERRORS.inc(component="write_behind")
+                logger.warning(
+                    "Write-behind batch failed",
+                    extra={"queue": self.name, "batch_size": len(records), "attempt": attempt + 1, "error": str(e)}
+                )
+                if attempt < self.max_retries:
+                    time.sleep(min(2 ** attempt * 0.1, 2.0))
+        self._write_each(batch)
+
+    def _write_each(self, batch):
+        """Fallback after a batch keeps failing: write every record on its own."""
+        for queued_at, record in batch:
+            try:
+                self.write_fn([record])
+                with self._lock:
+                    self.written += 1
+                    self.last_write_lag = time.monotonic() - queued_at
+            except Exception as e:
+                with self._lock:
+                    self.dropped += 1
+                ERRORS.inc(component="write_behind")
+                logger.error("Write-behind record dropped", extra={"queue": self.name, "error": str(e)})
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                if self._closed and self._queue.empty():
+                    return
+                continue
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Block until everything queued so far has been written (or dropped)."""
+        self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+
+    def stats(self):
+        # Age of the oldest record still waiting = current write lag
+        with self._queue.mutex:
+            oldest = self._queue.queue[0][0] if self._queue.queue else None
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_size": self.max_size,
+                "lag_seconds": (time.monotonic() - oldest) if oldest is not None else 0.0,
+                "last_write_lag_seconds": self.last_write_lag,
+                "last_batch_size": self.last_batch_size,
+                "written": self.written,
+                "batches": self.batches,
+                "failed_batches": self.failed_batches,
+                "dropped": self.dropped,
+                "rejected": self.rejected,
+            }